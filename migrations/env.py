@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+import os
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+import config  # Loads the .env file, like every entry point of the application
+from models import Base
+
+alembic_config = context.config
+alembic_config.set_main_option('sqlalchemy.url', os.environ['DATABASE_URL'])
+
+if alembic_config.config_file_name is not None:
+    fileConfig(alembic_config.config_file_name)
+
+# Metadata of the models, used by `alembic revision --autogenerate`
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    """
+    Emits the migrations as SQL without connecting to the database.
+    """
+    context.configure(
+        url=alembic_config.get_main_option('sqlalchemy.url'),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={'paramstyle': 'named'},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """
+    Applies the migrations to the database.
+    """
+    connectable = engine_from_config(
+        alembic_config.get_section(alembic_config.config_ini_section, {}),
+        prefix='sqlalchemy.',
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
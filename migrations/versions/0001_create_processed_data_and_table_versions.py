@@ -0,0 +1,50 @@
+"""Create the processed_data and table_versions tables
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Databases set up before the migrations were part of the repository
+    # already have the tables of their own autogenerated revisions
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'processed_data' not in existing:
+        create_processed_data()
+    if 'table_versions' not in existing:
+        op.create_table(
+            'table_versions',
+            sa.Column('table_name', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('table_name'),
+        )
+
+def create_processed_data() -> None:
+    op.create_table(
+        'processed_data',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('ip_address', sa.String(length=15), nullable=True),
+        sa.Column('marketing_channel', sa.String(length=50), nullable=True),
+        sa.Column('purchase', sa.Float(), nullable=True),
+        sa.Column('state', sa.String(length=50), nullable=True),
+        sa.Column('time_spent_seconds', sa.Integer(), nullable=True),
+        sa.Column('converted', sa.Integer(), nullable=True),
+        sa.Column('state_abbreviation', sa.String(length=50), nullable=True),
+        sa.Column('purchase_normalized', sa.Float(), nullable=True),
+        sa.Column('percentile_85_state', sa.Integer(), nullable=True),
+        sa.Column('percentile_85_national', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+def downgrade() -> None:
+    op.drop_table('table_versions')
+    op.drop_table('processed_data')
@@ -0,0 +1,31 @@
+"""Create the load_checkpoints table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    if 'load_checkpoints' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'load_checkpoints',
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('file_path', sa.String(length=255), nullable=True),
+        sa.Column('rows_committed', sa.Integer(), nullable=False),
+        sa.Column('total_rows', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('fingerprint'),
+    )
+
+def downgrade() -> None:
+    op.drop_table('load_checkpoints')
@@ -0,0 +1,287 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns of processed_data read by the engine
+ANALYTICS_COLUMNS = ['state', 'marketing_channel', 'converted', 'purchase']
+
+# Upper bound on the number of values drawn at once by a bootstrap, to bound memory.
+BOOTSTRAP_MAX_DRAWS = 10_000_000
+
+# Cohort of the rows whose group column is missing.
+MISSING_GROUP = '(missing)'
+
+# Bootstrap process pools of this process by number of processes, reused across summaries
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_pid = None
+_executors_lock = threading.Lock()
+
+def bootstrap_mean_ci(values: np.ndarray, n_bootstrap: int, confidence: float, seed) -> Tuple[float, float]:
+    """
+    Computes a percentile bootstrap confidence interval of the mean of some values.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The observed values.
+    n_bootstrap : int
+        The number of bootstrap resamples.
+    confidence : float
+        The confidence level of the interval, e.g. 0.95.
+    seed : int or np.random.SeedSequence
+        Seed of the random generator, for reproducible intervals.
+
+    Returns
+    -------
+    Tuple[float, float]
+        The lower and upper bound of the interval, or NaN if there are no values.
+    """
+    n = len(values)
+    if n == 0 or n_bootstrap == 0:
+        return float('nan'), float('nan')
+    rng = np.random.default_rng(seed)
+    means = np.empty(n_bootstrap)
+    step = max(1, BOOTSTRAP_MAX_DRAWS // n)
+    for start in range(0, n_bootstrap, step):
+        size = min(step, n_bootstrap - start)
+        means[start:start + size] = values[rng.integers(0, n, (size, n))].mean(axis=1)
+    tail = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [tail, 1 - tail])
+    return float(lower), float(upper)
+
+def _bootstrap_task(args: tuple) -> Tuple[float, float]:
+    return bootstrap_mean_ci(*args)
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the bootstrap process pool of this process with the given number of processes, starting it on first use.
+    """
+    global _executors_pid
+    with _executors_lock:
+        # The pools of a parent process cannot be used after a fork
+        if _executors_pid != os.getpid():
+            _executors.clear()
+            _executors_pid = os.getpid()
+        if workers not in _executors:
+            # spawn, as forking a process with running threads (e.g. a server worker) is unsafe
+            context = multiprocessing.get_context('spawn')
+            _executors[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _executors[workers]
+
+def _discard_executor(workers: int, executor: ProcessPoolExecutor) -> None:
+    """
+    Forgets a broken bootstrap process pool, so that the next summary starts a new one.
+    """
+    with _executors_lock:
+        if _executors.get(workers) is executor:
+            del _executors[workers]
+    executor.shutdown(wait=False)
+
+class AttributionEngine:
+    """
+    A class to compute conversion and revenue attribution by cohort.
+
+    Batches of processed rows are reduced to the few columns the metrics need
+    (group columns as categoricals) as they are added, so the rows of the
+    processed_data table can be read in chunks. Metrics are computed with
+    vectorized groupby aggregations; bootstrap confidence intervals of the
+    revenue per visitor are computed in parallel across processes. The
+    process pool is started on first use and reused by all engines of the
+    process. Rows with a missing group column form a '(missing)' cohort.
+
+    Attributes
+    ----------
+    confidence : float
+        The confidence level of the intervals.
+    n_bootstrap : int
+        The number of bootstrap resamples; 0 disables the bootstrap intervals.
+    workers : int or None
+        The number of processes computing bootstrap intervals; all CPUs if None.
+    seed : int or None
+        Seed of the bootstrap, for reproducible intervals.
+    min_parallel_draws : int
+        Minimum number of bootstrap draws (rows times resamples) for the
+        bootstrap to be spread across processes.
+
+    Methods
+    -------
+    add_batch(data: pd.DataFrame) -> None
+        Adds a batch of processed rows.
+    load_from_database(db: DatabaseConnection, batch_size: int = 10000) -> None
+        Adds all rows of the processed_data table, read in batches.
+    summary(by: Sequence[str] = ('state', 'marketing_channel')) -> pd.DataFrame
+        Computes the conversion and revenue metrics of each cohort.
+    """
+
+    def __init__(
+        self,
+        confidence: float = 0.95,
+        n_bootstrap: int = 1000,
+        workers: Optional[int] = None,
+        seed: Optional[int] = None,
+        min_parallel_draws: int = 50_000_000,
+    ) -> None:
+        """
+        Constructs all the necessary attributes for the AttributionEngine object.
+
+        Parameters
+        ----------
+        confidence : float, optional
+            The confidence level of the intervals (default is 0.95).
+        n_bootstrap : int, optional
+            The number of bootstrap resamples; 0 disables the bootstrap intervals (default is 1000).
+        workers : int, optional
+            The number of processes computing bootstrap intervals; all CPUs if None.
+        seed : int, optional
+            Seed of the bootstrap, for reproducible intervals.
+        min_parallel_draws : int, optional
+            Minimum number of bootstrap draws for the bootstrap to be spread across processes.
+        """
+        self.confidence = confidence
+        self.n_bootstrap = n_bootstrap
+        self.workers = workers
+        self.seed = seed
+        self.min_parallel_draws = min_parallel_draws
+        self._batches: List[pd.DataFrame] = []
+
+    def add_batch(self, data: pd.DataFrame) -> None:
+        """
+        Adds a batch of processed rows.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Rows with the 'state', 'marketing_channel', 'converted' and 'purchase' columns.
+        """
+        purchase = pd.to_numeric(data['purchase'], errors='coerce')
+        self._batches.append(pd.DataFrame({
+            'state': data['state'].astype(object).fillna(MISSING_GROUP).astype('category'),
+            'marketing_channel': data['marketing_channel'].astype(object).fillna(MISSING_GROUP).astype('category'),
+            'converted': pd.to_numeric(data['converted'], errors='coerce').fillna(0).astype(np.int8),
+            'revenue': purchase.fillna(0.0).astype(np.float64),
+        }))
+
+    def load_from_database(self, db, batch_size: int = 10000) -> None:
+        """
+        Adds all rows of the processed_data table, read in batches.
+
+        Parameters
+        ----------
+        db : DatabaseConnection
+            An open database connection.
+        batch_size : int, optional
+            The number of rows read at a time (default is 10000).
+        """
+        columns, batches = db.fetch_batches(
+            f"SELECT {', '.join(ANALYTICS_COLUMNS)} FROM processed_data", batch_size=batch_size
+        )
+        names = [column.name for column in columns]
+        try:
+            for rows in batches:
+                self.add_batch(pd.DataFrame.from_records(rows, columns=names))
+        finally:
+            batches.close()
+
+    def _data(self) -> pd.DataFrame:
+        """
+        Returns the added rows as one DataFrame, concatenating the batches once.
+        """
+        if not self._batches:
+            return pd.DataFrame({
+                'state': pd.Categorical([]),
+                'marketing_channel': pd.Categorical([]),
+                'converted': np.array([], dtype=np.int8),
+                'revenue': np.array([], dtype=np.float64),
+            })
+        if len(self._batches) > 1:
+            from pandas.api.types import union_categoricals
+            data = pd.DataFrame({
+                column: union_categoricals([batch[column] for batch in self._batches])
+                for column in ('state', 'marketing_channel')
+            })
+            for column in ('converted', 'revenue'):
+                data[column] = np.concatenate([batch[column].to_numpy() for batch in self._batches])
+            self._batches = [data]
+        return self._batches[0]
+
+    def summary(self, by: Sequence[str] = ('state', 'marketing_channel')) -> pd.DataFrame:
+        """
+        Computes the conversion and revenue metrics of each cohort.
+
+        Parameters
+        ----------
+        by : Sequence[str], optional
+            The columns defining the cohorts (default is state by marketing channel).
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per cohort with the number of visitors and conversions, the
+            conversion rate with its Wilson score interval, the revenue and its
+            share of the total, the revenue per conversion and the revenue per
+            visitor with its bootstrap interval.
+        """
+        by = list(by)
+        data = self._data()
+        grouped = data.groupby(by, observed=True, sort=True)
+        result = grouped.agg(
+            visitors=('converted', 'size'),
+            conversions=('converted', 'sum'),
+            revenue=('revenue', 'sum'),
+        )
+        visitors = result['visitors'].to_numpy(dtype=float)
+        conversions = result['conversions'].to_numpy(dtype=float)
+
+        rate = conversions / visitors
+        z = NormalDist().inv_cdf(1 - (1 - self.confidence) / 2)
+        center = (rate + z ** 2 / (2 * visitors)) / (1 + z ** 2 / visitors)
+        margin = z * np.sqrt(rate * (1 - rate) / visitors + z ** 2 / (4 * visitors ** 2)) / (1 + z ** 2 / visitors)
+        result['conversion_rate'] = rate
+        result['conversion_rate_lower'] = center - margin
+        result['conversion_rate_upper'] = center + margin
+
+        total_revenue = result['revenue'].sum()
+        result['revenue_share'] = result['revenue'] / total_revenue if total_revenue else np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['revenue_per_conversion'] = np.where(
+                conversions > 0, result['revenue'].to_numpy() / conversions, np.nan
+            )
+        result['revenue_per_visitor'] = result['revenue'] / visitors
+
+        intervals = self._bootstrap(data, grouped.ngroup().to_numpy(), len(result))
+        result['revenue_per_visitor_lower'] = [lower for lower, _ in intervals]
+        result['revenue_per_visitor_upper'] = [upper for _, upper in intervals]
+        return result.reset_index()
+
+    def _bootstrap(self, data: pd.DataFrame, codes: np.ndarray, n_groups: int) -> List[Tuple[float, float]]:
+        """
+        Computes the bootstrap interval of the revenue per visitor of every cohort.
+        """
+        if self.n_bootstrap == 0 or n_groups == 0:
+            return [(float('nan'), float('nan'))] * n_groups
+
+        order = np.argsort(codes, kind='stable')
+        revenue = data['revenue'].to_numpy()[order]
+        splits = np.cumsum(np.bincount(codes, minlength=n_groups))[:-1]
+        seeds = np.random.SeedSequence(self.seed).spawn(n_groups)
+        tasks = [
+            (values, self.n_bootstrap, self.confidence, seed)
+            for values, seed in zip(np.split(revenue, splits), seeds)
+        ]
+
+        workers = self.workers or multiprocessing.cpu_count()
+        if workers <= 1 or n_groups == 1 or len(revenue) * self.n_bootstrap < self.min_parallel_draws:
+            return [_bootstrap_task(task) for task in tasks]
+        executor = _get_executor(workers)
+        try:
+            return list(executor.map(_bootstrap_task, tasks, chunksize=max(1, n_groups // (4 * workers))))
+        except BrokenProcessPool:
+            _discard_executor(workers, executor)
+            raise
@@ -0,0 +1,512 @@
+import json
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+class AnomalyDetector:
+    """
+    A class to flag outliers and report distribution drift across batches of data.
+
+    For every (state, marketing channel) group and every monitored column the
+    detector keeps an exponentially weighted mean and variance and a decayed
+    histogram over fixed bin edges, which acts as a quantile sketch. The bin
+    edges are the quantiles of the first ``min_sketch_rows`` values of a column;
+    until that many values have been seen they are buffered and no drift is
+    reported, so small first batches do not fix coarse edges for good.
+
+    Bin counts are pooled over consecutive batches until a group (or the whole
+    country) has ``min_group_rows`` rows, and only then compared against the
+    baseline, so small batches are not scored on a handful of rows per bin.
+    Histograms are smoothed by adding half a row to every bin, and the
+    population stability index is reduced by its expected value under no
+    drift, (bins - 1) * (1 / rows + 1 / baseline rows), where the baseline rows
+    are the effective sample size of the weighted baseline. All other state is
+    held in NumPy arrays of shape (groups,) or (groups, bins), so memory only
+    grows with the number of groups and each batch is processed in O(batch) time.
+
+    Attributes
+    ----------
+    columns : Sequence[str]
+        The numeric columns to monitor.
+    group_columns : Sequence[str]
+        The columns defining the groups baselines are kept for.
+    alpha : float
+        Weight of a new batch in the exponentially weighted baselines.
+    z_threshold : float
+        Absolute z-score above which a value is flagged as an outlier.
+    bins : int
+        Number of quantile bins of the histogram sketches.
+    drift_threshold : float
+        Population stability index above which a distribution is reported as drifted.
+    min_group_rows : int
+        Minimum number of rows, pooled over consecutive batches, a distribution is compared on.
+    min_sketch_rows : int
+        Number of values of a column the bin edges of its sketches are computed from.
+    batches : int
+        Number of batches processed so far.
+    last_report : dict or None
+        The report of the last processed batch.
+
+    Methods
+    -------
+    update(data: pd.DataFrame) -> dict
+        Flags outliers in a batch, reports its drift and updates the baselines.
+    prepare(data: pd.DataFrame) -> dict
+        Extracts the group keys and the monitored values of a batch.
+    update_prepared(batch: dict) -> Tuple[dict, Dict[str, np.ndarray]]
+        Reports the drift of a prepared batch, updates the baselines and returns the outlier flags.
+    quantile(column: str, q: float, group: tuple = None) -> float
+        Estimates a quantile of the baseline distribution of a column.
+    save(file) -> None
+        Writes the state of the detector to a binary file in the NumPy ``.npz`` format.
+    load(file) -> AnomalyDetector
+        Reads a detector written by ``save``.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = ('purchase', 'time_spent_seconds'),
+        group_columns: Sequence[str] = ('state', 'marketing_channel'),
+        alpha: float = 0.1,
+        z_threshold: float = 3.0,
+        bins: int = 32,
+        drift_threshold: float = 0.2,
+        min_group_rows: Optional[int] = None,
+        min_sketch_rows: int = 1000,
+    ) -> None:
+        """
+        Constructs all the necessary attributes for the AnomalyDetector object.
+
+        Parameters
+        ----------
+        columns : Sequence[str], optional
+            The numeric columns to monitor.
+        group_columns : Sequence[str], optional
+            The columns defining the groups baselines are kept for.
+        alpha : float, optional
+            Weight of a new batch in the exponentially weighted baselines (default is 0.1).
+        z_threshold : float, optional
+            Absolute z-score above which a value is flagged as an outlier (default is 3.0).
+        bins : int, optional
+            Number of quantile bins of the histogram sketches (default is 32).
+        drift_threshold : float, optional
+            Population stability index above which a distribution is reported as drifted (default is 0.2).
+        min_group_rows : int, optional
+            Minimum number of rows, pooled over consecutive batches, a distribution
+            is compared on (default is ten per bin).
+        min_sketch_rows : int, optional
+            Number of values of a column the bin edges of its sketches are computed from (default is 1000).
+        """
+        self.columns = list(columns)
+        self.group_columns = list(group_columns)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.bins = bins
+        self.drift_threshold = drift_threshold
+        self.min_group_rows = min_group_rows if min_group_rows is not None else 10 * bins
+        self.min_sketch_rows = min_sketch_rows
+        self.batches = 0
+        self.last_report = None
+        self._groups: Dict[tuple, int] = {}
+        self._group_keys: List[tuple] = []
+        self._mean = {column: np.zeros(0) for column in self.columns}
+        self._var = {column: np.zeros(0) for column in self.columns}
+        self._seen = {column: np.zeros(0, dtype=bool) for column in self.columns}
+        self._edges: Dict[str, Optional[np.ndarray]] = {column: None for column in self.columns}
+        self._hist = {column: np.zeros((0, 0)) for column in self.columns}
+        self._hist_rows = {column: np.zeros(0) for column in self.columns}
+        self._drift_counts = {column: np.zeros((0, 0)) for column in self.columns}
+        self._national_hist: Dict[str, Optional[np.ndarray]] = {column: None for column in self.columns}
+        self._national_rows = {column: 0.0 for column in self.columns}
+        self._national_drift_counts: Dict[str, Optional[np.ndarray]] = {column: None for column in self.columns}
+        self._pending: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {column: [] for column in self.columns}
+        self._lock = threading.Lock()
+
+    def _group_index(self, codes: np.ndarray, uniques: List[tuple]) -> np.ndarray:
+        """
+        Maps every row to the index of its group, registering new groups.
+        """
+        mapping = np.empty(len(uniques), dtype=np.intp)
+        for i, key in enumerate(uniques):
+            if key not in self._groups:
+                self._groups[key] = len(self._group_keys)
+                self._group_keys.append(key)
+            mapping[i] = self._groups[key]
+
+        size = len(self._group_keys)
+        for column in self.columns:
+            grow = size - len(self._mean[column])
+            if grow:
+                self._mean[column] = np.concatenate([self._mean[column], np.zeros(grow)])
+                self._var[column] = np.concatenate([self._var[column], np.zeros(grow)])
+                self._seen[column] = np.concatenate([self._seen[column], np.zeros(grow, dtype=bool)])
+                self._hist_rows[column] = np.concatenate([self._hist_rows[column], np.zeros(grow)])
+                if self._edges[column] is not None:
+                    n_bins = self._hist[column].shape[1]
+                    self._hist[column] = np.vstack([self._hist[column], np.zeros((grow, n_bins))])
+                    self._drift_counts[column] = np.vstack([self._drift_counts[column], np.zeros((grow, n_bins))])
+        return mapping[codes]
+
+    def _histograms(self, column: str, groups: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the per-group bin counts and the national bin counts of a batch.
+        """
+        edges = self._edges[column]
+        n_bins = len(edges) + 1
+        bin_index = np.searchsorted(edges, values, side='right')
+        counts = np.bincount(
+            groups * n_bins + bin_index, minlength=len(self._group_keys) * n_bins
+        ).reshape(-1, n_bins).astype(float)
+        return counts, counts.sum(axis=0)
+
+    def _build_sketch(self, column: str, groups: np.ndarray, values: np.ndarray) -> None:
+        """
+        Buffers the values of a column until ``min_sketch_rows`` have been seen, then builds its sketches.
+        """
+        pending = self._pending[column]
+        pending.append((groups, values))
+        if sum(len(x) for _, x in pending) < self.min_sketch_rows:
+            return
+
+        groups = np.concatenate([g for g, _ in pending])
+        values = np.concatenate([x for _, x in pending])
+        self._pending[column] = []
+        self._edges[column] = np.unique(np.quantile(values, np.linspace(0, 1, self.bins + 1)[1:-1]))
+        counts, national = self._histograms(column, groups, values)
+        # Groups with too few rows for a baseline start pooling towards one
+        rows = counts.sum(axis=1)
+        ready = rows >= self.min_group_rows
+        self._hist[column] = np.where(ready[:, None], self._smooth(counts), 0.0)
+        self._hist_rows[column] = np.where(ready, rows, 0.0)
+        self._drift_counts[column] = np.where(ready[:, None], 0.0, counts)
+        self._national_hist[column] = self._smooth(national)
+        self._national_rows[column] = float(national.sum())
+        self._national_drift_counts[column] = np.zeros_like(national)
+
+    @staticmethod
+    def _smooth(counts: np.ndarray) -> np.ndarray:
+        """
+        Turns bin counts into probabilities along the last axis, adding half a row to every bin.
+        """
+        return (counts + 0.5) / (counts.sum(axis=-1, keepdims=True) + 0.5 * counts.shape[-1])
+
+    @staticmethod
+    def _psi(expected: np.ndarray, actual: np.ndarray, expected_rows, actual_rows) -> np.ndarray:
+        """
+        Computes the population stability index along the last axis, less its expected value under no drift.
+        """
+        psi = ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+        bias = (actual.shape[-1] - 1) * (1 / expected_rows + 1 / actual_rows)
+        return np.clip(psi - bias, 0, None)
+
+    def _effective_rows(self, baseline_rows, rows):
+        """
+        Returns the effective sample size of a baseline after it was weighted with a new sample.
+        """
+        return 1 / ((1 - self.alpha) ** 2 / baseline_rows + self.alpha ** 2 / rows)
+
+    def update(self, data: pd.DataFrame) -> dict:
+        """
+        Flags outliers in a batch, reports its drift and updates the baselines.
+
+        Values are compared against the baseline of their group as it was before
+        this batch; groups seen for the first time are compared against their
+        own statistics in the batch. For every monitored column an
+        '<column>_outlier' column (1 if the value is an outlier, 0 otherwise)
+        is added to the data.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            The batch, containing the monitored and the group columns.
+
+        Returns
+        -------
+        dict
+            The number of outliers per column and, once enough rows have been
+            pooled to compare, the population stability index of the pooled
+            rows against the national baseline and the groups whose
+            distribution drifted.
+        """
+        report, flags = self.update_prepared(self.prepare(data))
+        for column, column_flags in flags.items():
+            data[column + '_outlier'] = column_flags
+        return report
+
+    def prepare(self, data: pd.DataFrame) -> dict:
+        """
+        Extracts the group keys and the monitored values of a batch.
+
+        This is the pandas part of ``update``. It does not read the baselines,
+        so callers sharing a detector can run it before taking their lock.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            The batch, containing the monitored and the group columns.
+
+        Returns
+        -------
+        dict
+            The group code of every row, the distinct group keys and the
+            values of every monitored column as float arrays.
+        """
+        keys = pd.MultiIndex.from_frame(data[self.group_columns].astype(object).fillna(''))
+        codes, uniques = pd.factorize(keys)
+        return {
+            'codes': codes,
+            'keys': [tuple(key) for key in uniques],
+            'values': {
+                column: pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=float)
+                for column in self.columns
+            },
+        }
+
+    def update_prepared(self, batch: dict) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Reports the drift of a prepared batch, updates the baselines and returns the outlier flags.
+
+        Parameters
+        ----------
+        batch : dict
+            A batch returned by ``prepare``.
+
+        Returns
+        -------
+        Tuple[dict, Dict[str, np.ndarray]]
+            The report of the batch (see ``update``) and the outlier flags of
+            its rows per monitored column.
+        """
+        with self._lock:
+            groups = self._group_index(batch['codes'], batch['keys'])
+            size = len(self._group_keys)
+            report = {'batch': self.batches + 1, 'rows': len(batch['codes']), 'outliers': {}, 'drift': {}}
+            all_flags = {}
+
+            for column in self.columns:
+                values = batch['values'][column]
+                valid = ~np.isnan(values)
+                g, x = groups[valid], values[valid]
+
+                # Batch statistics per group
+                n = np.bincount(g, minlength=size).astype(float)
+                total = np.bincount(g, weights=x, minlength=size)
+                squares = np.bincount(g, weights=x * x, minlength=size)
+                present = n > 0
+                batch_mean = np.divide(total, n, out=np.zeros(size), where=present)
+                batch_var = np.clip(
+                    np.divide(squares, n, out=np.zeros(size), where=present) - batch_mean ** 2, 0, None
+                )
+
+                # Outliers against the previous baseline
+                seen = self._seen[column]
+                reference_mean = np.where(seen, self._mean[column], batch_mean)
+                reference_std = np.sqrt(np.where(seen, self._var[column], batch_var))
+                flags = np.zeros(len(values), dtype=int)
+                std = reference_std[g]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z = np.abs(x - reference_mean[g]) / std
+                flags[valid] = ((std > 0) & (z > self.z_threshold)).astype(int)
+                all_flags[column] = flags
+                report['outliers'][column] = int(flags.sum())
+
+                # Drift of the batch distribution against the baseline sketches
+                if self._edges[column] is None:
+                    self._build_sketch(column, g, x)
+                    report['drift'][column] = {'psi': None, 'drifted': False, 'groups': []}
+                else:
+                    report['drift'][column] = self._update_sketches(column, g, x)
+
+                # Update the baselines of the groups present in the batch
+                first = present & ~seen
+                update = present & seen
+                delta = batch_mean - self._mean[column]
+                self._mean[column] = np.where(first, batch_mean, np.where(
+                    update, self._mean[column] + self.alpha * delta, self._mean[column]
+                ))
+                self._var[column] = np.where(first, batch_var, np.where(
+                    update,
+                    (1 - self.alpha) * (self._var[column] + self.alpha * delta ** 2) + self.alpha * batch_var,
+                    self._var[column],
+                ))
+                self._seen[column] = seen | present
+
+            self.batches += 1
+            self.last_report = report
+            return report, all_flags
+
+    def _update_sketches(self, column: str, groups: np.ndarray, values: np.ndarray) -> dict:
+        """
+        Pools the bin counts of a batch and compares the distributions that reached ``min_group_rows`` rows.
+        """
+        counts, national = self._histograms(column, groups, values)
+        pooled = self._drift_counts[column] + counts
+        national_pooled = self._national_drift_counts[column] + national
+        drift = {'psi': None, 'drifted': False, 'groups': []}
+
+        national_rows = float(national_pooled.sum())
+        if national_rows >= self.min_group_rows:
+            actual = self._smooth(national_pooled)
+            psi = float(self._psi(self._national_hist[column], actual, self._national_rows[column], national_rows))
+            drift['psi'] = psi
+            drift['drifted'] = psi > self.drift_threshold
+            self._national_hist[column] = (1 - self.alpha) * self._national_hist[column] + self.alpha * actual
+            self._national_rows[column] = float(self._effective_rows(self._national_rows[column], national_rows))
+            national_pooled = np.zeros_like(national_pooled)
+
+        rows = pooled.sum(axis=1)
+        baseline_rows = self._hist_rows[column]
+        ready = rows >= self.min_group_rows
+        scored = np.flatnonzero(ready & (baseline_rows > 0))
+        if len(scored):
+            actual = self._smooth(pooled[scored])
+            group_psi = self._psi(self._hist[column][scored], actual, baseline_rows[scored], rows[scored])
+            drift['groups'] = [
+                dict(zip(self.group_columns, self._group_keys[i]), psi=float(psi))
+                for i, psi in zip(scored, group_psi)
+                if psi > self.drift_threshold
+            ]
+            self._hist[column][scored] = (1 - self.alpha) * self._hist[column][scored] + self.alpha * actual
+            baseline_rows[scored] = self._effective_rows(baseline_rows[scored], rows[scored])
+
+        first = np.flatnonzero(ready & (baseline_rows == 0))
+        self._hist[column][first] = self._smooth(pooled[first])
+        baseline_rows[first] = rows[first]
+        pooled[ready] = 0
+        self._drift_counts[column] = pooled
+        self._national_drift_counts[column] = national_pooled
+        return drift
+
+    def quantile(self, column: str, q: float, group: tuple = None) -> float:
+        """
+        Estimates a quantile of the baseline distribution of a column.
+
+        The estimate interpolates linearly within the bins of the histogram
+        sketch, so its resolution is limited by the number of bins.
+
+        Parameters
+        ----------
+        column : str
+            The monitored column.
+        q : float
+            The quantile to estimate, between 0 and 1.
+        group : tuple, optional
+            The values of the group columns; the national baseline is used if omitted.
+
+        Returns
+        -------
+        float
+            The estimated quantile, or NaN if no baseline exists.
+        """
+        edges = self._edges[column]
+        if edges is None or not len(edges):
+            return float('nan')
+        if group is None:
+            probabilities = self._national_hist[column]
+        elif group in self._groups and self._hist_rows[column][self._groups[group]] > 0:
+            probabilities = self._hist[column][self._groups[group]]
+        else:
+            return float('nan')
+
+        cdf = np.cumsum(probabilities)
+        i = int(np.searchsorted(cdf, q, side='left'))
+        if i == 0:
+            return float(edges[0])
+        if i >= len(edges):
+            return float(edges[-1])
+        below = cdf[i - 1]
+        fraction = (q - below) / probabilities[i] if probabilities[i] > 0 else 0.0
+        return float(edges[i - 1] + fraction * (edges[i] - edges[i - 1]))
+
+    def save(self, file) -> None:
+        """
+        Writes the state of the detector to a binary file in the NumPy ``.npz`` format.
+
+        The arrays are stored as they are and everything else as JSON, so the
+        file can be read back without pickle.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            The path or the binary file to write to.
+        """
+        with self._lock:
+            meta = {
+                'columns': self.columns,
+                'group_columns': self.group_columns,
+                'alpha': self.alpha,
+                'z_threshold': self.z_threshold,
+                'bins': self.bins,
+                'drift_threshold': self.drift_threshold,
+                'min_group_rows': self.min_group_rows,
+                'min_sketch_rows': self.min_sketch_rows,
+                'batches': self.batches,
+                'last_report': self.last_report,
+                'group_keys': self._group_keys,
+            }
+            arrays = {'meta': np.array(json.dumps(meta, default=lambda value: value.item()))}
+            for i, column in enumerate(self.columns):
+                arrays[f'mean_{i}'] = self._mean[column]
+                arrays[f'var_{i}'] = self._var[column]
+                arrays[f'seen_{i}'] = self._seen[column]
+                arrays[f'hist_{i}'] = self._hist[column]
+                arrays[f'hist_rows_{i}'] = self._hist_rows[column]
+                arrays[f'drift_counts_{i}'] = self._drift_counts[column]
+                if self._edges[column] is not None:
+                    arrays[f'edges_{i}'] = self._edges[column]
+                    arrays[f'national_hist_{i}'] = self._national_hist[column]
+                    arrays[f'national_rows_{i}'] = np.array(self._national_rows[column])
+                    arrays[f'national_drift_counts_{i}'] = self._national_drift_counts[column]
+                pending = self._pending[column]
+                arrays[f'pending_groups_{i}'] = np.concatenate([g for g, _ in pending] or [np.zeros(0, dtype=np.intp)])
+                arrays[f'pending_values_{i}'] = np.concatenate([x for _, x in pending] or [np.zeros(0)])
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file) -> 'AnomalyDetector':
+        """
+        Reads a detector written by ``save``.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            The path or the binary file to read from.
+
+        Returns
+        -------
+        AnomalyDetector
+            The restored detector.
+        """
+        with np.load(file, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            detector = cls(
+                columns=meta['columns'],
+                group_columns=meta['group_columns'],
+                alpha=meta['alpha'],
+                z_threshold=meta['z_threshold'],
+                bins=meta['bins'],
+                drift_threshold=meta['drift_threshold'],
+                min_group_rows=meta['min_group_rows'],
+                min_sketch_rows=meta['min_sketch_rows'],
+            )
+            detector.batches = meta['batches']
+            detector.last_report = meta['last_report']
+            detector._group_keys = [tuple(key) for key in meta['group_keys']]
+            detector._groups = {key: i for i, key in enumerate(detector._group_keys)}
+            for i, column in enumerate(detector.columns):
+                detector._mean[column] = arrays[f'mean_{i}']
+                detector._var[column] = arrays[f'var_{i}']
+                detector._seen[column] = arrays[f'seen_{i}']
+                detector._hist[column] = arrays[f'hist_{i}']
+                detector._hist_rows[column] = arrays[f'hist_rows_{i}']
+                detector._drift_counts[column] = arrays[f'drift_counts_{i}']
+                if f'edges_{i}' in arrays.files:
+                    detector._edges[column] = arrays[f'edges_{i}']
+                    detector._national_hist[column] = arrays[f'national_hist_{i}']
+                    detector._national_rows[column] = float(arrays[f'national_rows_{i}'])
+                    detector._national_drift_counts[column] = arrays[f'national_drift_counts_{i}']
+                if len(arrays[f'pending_values_{i}']):
+                    detector._pending[column] = [(arrays[f'pending_groups_{i}'], arrays[f'pending_values_{i}'])]
+        return detector
@@ -1,18 +1,258 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import List, Optional
-import pandas as pd
-from csv_reader import CSVReader
-from data_processor import DataProcessor
-from database import DatabaseConnection
-from fastapi.responses import RedirectResponse
-from dotenv import load_dotenv
+from contextlib import ExitStack, asynccontextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+import json
+import logging
 import os
+import threading
+import config
+from cache import ResponseCache, SharedResponseCache, TableVersionTracker
+from coordination import SharedState, ensure_private_dir
+from database import DatabaseConnection, close_pool
+from exporters import (
+    ENCODERS, FORMATS, compress, is_available, is_missing, negotiate_encoding, negotiate_format,
+)
+from profiling import NULL_PROFILER, Profiler, ProfilerBusyError
+from fastapi.responses import RedirectResponse, StreamingResponse
 
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Releases the resources of the worker once it has drained its requests on shutdown.
+    """
+    yield
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+def fetch_table_version(table_name: str) -> int:
+    """
+    Fetches the write version of a table from the database.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+
+    Returns
+    -------
+    int
+        The current version of the table.
+    """
+    db = DatabaseConnection()
+    db.connect()
+    try:
+        return db.get_table_version(table_name)
+    finally:
+        db.close()
+
+table_versions = TableVersionTracker(fetch_table_version, ttl=config.CACHE_VERSION_TTL)
+if config.SHARED_STATE_DIR:
+    ensure_private_dir(config.SHARED_STATE_DIR)
+response_cache = ResponseCache(
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    shared=SharedResponseCache(os.path.join(config.SHARED_STATE_DIR, 'responses'))
+    if config.SHARED_STATE_DIR else None,
+)
+
+def load_anomaly_detector(f):
+    """
+    Reads the shared anomaly detector, importing its module only when needed.
+    """
+    from anomaly import AnomalyDetector
+
+    return AnomalyDetector.load(f)
+
+def dump_anomaly_detector(detector, f) -> None:
+    """
+    Writes the shared anomaly detector.
+    """
+    detector.save(f)
+
+# Baselines of the anomaly detection, kept in SHARED_STATE_DIR if it is set and
+# per process otherwise. The detector is created on first use, as it requires pandas.
+anomaly_detector = None
+anomaly_detector_lock = threading.Lock()
+anomaly_state = (
+    SharedState(
+        os.path.join(config.SHARED_STATE_DIR, 'anomaly_detector.npz'), load_anomaly_detector, dump_anomaly_detector
+    )
+    if config.SHARED_STATE_DIR else None
+)
+
+def update_anomaly_baselines(data) -> dict:
+    """
+    Flags outliers and drift in a batch against the baselines of the batches received so far.
+
+    For every monitored column an '<column>_outlier' column (1 if the value is
+    an outlier, 0 otherwise) is added to the batch.
+
+    With shared state, the workers take turns updating the baselines. Only the
+    NumPy update of the baselines runs under the lock shared by the workers;
+    the batch is prepared before, and a worker only reads the baselines back
+    from disk after another worker updated them.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The processed batch.
+
+    Returns
+    -------
+    dict
+        The report of the batch.
+    """
+    global anomaly_detector
+    from anomaly import AnomalyDetector
+
+    if anomaly_state is not None:
+        batch = AnomalyDetector().prepare(data)
+        flags = {}
+
+        def update(detector):
+            detector = detector or AnomalyDetector()
+            flags.update(detector.update_prepared(batch)[1])
+            return detector
+
+        report = anomaly_state.update(update).last_report
+        for column, column_flags in flags.items():
+            data[column + '_outlier'] = column_flags
+        return report
+
+    with anomaly_detector_lock:
+        if anomaly_detector is None:
+            anomaly_detector = AnomalyDetector()
+    return anomaly_detector.update(data)
+
+def check_not_modified(
+    request: Request, table_name: str, representation: Sequence[Tuple[str, str]]
+) -> Tuple[Optional[tuple], dict, bool]:
+    """
+    Resolves the cache key and ETag of a read request and evaluates ``If-None-Match``.
+
+    If the version of the table cannot be read, the response is neither cached
+    nor validated: the key is None and no ETag is sent, so a stale body can
+    never be served as current.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    table_name : str
+        The table the response is derived from.
+    representation : Sequence[Tuple[str, str]]
+        The negotiated format and encoding, which are part of the key.
+
+    Returns
+    -------
+    tuple
+        The cache key (or None), the response headers and whether the client's copy is current.
+    """
+    try:
+        version = table_versions.get(table_name)
+    except Exception as e:
+        logger.error(f'Could not read the version of {table_name}, not caching: {e}')
+        return None, {'Cache-Control': 'no-store', 'Vary': 'Accept, Accept-Encoding'}, False
+
+    params = list(request.query_params.multi_items()) + list(representation)
+    key = ResponseCache.make_key(request.url.path, params, version)
+    etag = ResponseCache.make_etag(key)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept, Accept-Encoding'}
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        if etag in candidates or 'W/' + etag in candidates or '*' in candidates:
+            return key, headers, True
+    return key, headers, False
+
+def cached_json_response(request: Request, table_name: str, build: Callable[[], object]) -> Response:
+    """
+    Returns a JSON response for a read endpoint, served from the response cache when possible.
+
+    The response carries an ETag derived from the endpoint, its query parameters
+    and the version of the table it reads. A request whose ``If-None-Match``
+    header matches gets a 304 without building the body or touching the cache.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    table_name : str
+        The table the response is derived from.
+    build : Callable[[], object]
+        Function returning the JSON-serializable content on a cache miss.
+
+    Returns
+    -------
+    Response
+        The JSON response, or an empty 304 response.
+    """
+    key, headers, not_modified = check_not_modified(request, table_name, [('format', 'json')])
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key) if key is not None else None
+    if body is None:
+        body = json.dumps(jsonable_encoder(build())).encode('utf-8')
+        if key is not None:
+            response_cache.put(key, body)
+
+    return Response(content=body, media_type='application/json', headers=headers)
+
+def export_response(request: Request, table_name: str, query: str, export_format: str) -> Response:
+    """
+    Streams the result of a query in a bulk export format.
+
+    Rows are read from a server-side cursor in batches of ``EXPORT_BATCH_SIZE``
+    and encoded and compressed batch by batch, so the full result is never
+    held in memory (except for the columnar JSON format). Export responses are
+    not stored in the response cache but support ``If-None-Match``.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    table_name : str
+        The table the query reads.
+    query : str
+        The SQL query to be executed.
+    export_format : str
+        One of the non-JSON keys of ``FORMATS``.
+
+    Returns
+    -------
+    Response
+        The streamed response, or an empty 304 response.
+    """
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    _, headers, not_modified = check_not_modified(
+        request, table_name, [('format', export_format), ('encoding', encoding)]
+    )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+
+    def body():
+        # The connection is only taken from the pool once the body is streamed,
+        # so a client disconnecting before that does not leak it
+        db = DatabaseConnection()
+        db.connect()
+        try:
+            columns, batches = db.fetch_batches(query, batch_size=config.EXPORT_BATCH_SIZE)
+            try:
+                yield from compress(ENCODERS[export_format](columns, batches), encoding)
+            finally:
+                batches.close()
+        finally:
+            db.close()
+
+    return StreamingResponse(body(), media_type=FORMATS[export_format], headers=headers)
 
 @app.get("/")
 async def redirect_to_docs():
@@ -76,24 +316,99 @@ class DataInput(BaseModel):
     data: List[DataRow]
 
 @app.post("/process_data/")
-def process_data(data_input: DataInput):
+def process_data(data_input: DataInput, response: Response, profile: bool = False):
     """
     Processes the input data and stores it in the database.
 
+    Rows failing validation are not stored; they are appended to the file set
+    in ``QUARANTINE_PATH`` (``quarantine.csv`` by default). With the ``PROFILE`` setting,
+    or with ``?profile=true`` if ``PROFILE_REQUESTS`` allows it, the request
+    is profiled and the file name prefix of the outputs in ``PROFILE_DIR`` is
+    returned in the ``X-Profile-Output`` header. Only one request per worker
+    is profiled at a time; with ``PROFILE`` the others run unprofiled.
+
     Parameters
     ----------
     data_input : DataInput
         Input data to be processed.
+    response : Response
+        The response, used to return the location of the profile.
+    profile : bool, optional
+        Whether to profile the request (default is False).
 
     Returns
     -------
     dict
         A message indicating that the data was processed and stored successfully.
+
+    Raises
+    ------
+    HTTPException
+        403 if a profile is requested but ``PROFILE_REQUESTS`` is off, 409 if
+        a profile is requested while another request is profiled, and 422 if
+        no row passed validation.
+    """
+    if profile and not config.PROFILE_REQUESTS:
+        raise HTTPException(status_code=403, detail='Profiling requests is disabled')
+
+    profiler = Profiler.create(profile or config.PROFILE, 'process_data', config.PROFILE_DIR, config.PROFILE_MODE)
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(profiler.run())
+        except ProfilerBusyError:
+            if profile:
+                raise HTTPException(status_code=409, detail='Another request is being profiled')
+            profiler = NULL_PROFILER
+        result = store_processed_data(data_input, profiler)
+    if profiler.output_path:
+        response.headers['X-Profile-Output'] = os.path.basename(profiler.output_path)
+    return result
+
+def store_processed_data(data_input: DataInput, profiler) -> dict:
+    """
+    Validates, processes and stores the input data.
+
+    Parameters
+    ----------
+    data_input : DataInput
+        Input data to be processed.
+    profiler : Profiler or NullProfiler
+        The profiler measuring the steps.
+
+    Returns
+    -------
+    dict
+        A message indicating that the data was processed and stored
+        successfully, the number of quarantined rows and of violations per
+        rule, and the positions in the input of the rows flagged as outliers
+        per monitored column.
+
+    Raises
+    ------
+    HTTPException
+        422 if no row passed validation.
     """
+    # pandas and the processor are imported on first use to keep worker startup fast
+    import pandas as pd
+    from data_processor import DataProcessor
+    from validation import DataValidator
+
     data = data_input.data
     df = pd.DataFrame([row.dict() for row in data])
-    
-    processor = DataProcessor(df)
+
+    # Set invalid rows aside before they skew the statistics of the batch
+    validator = DataValidator(df)
+    with profiler.step('validate'):
+        counts = validator.validate()
+    validator.quarantine_to_csv(config.API_QUARANTINE_PATH)
+    rows_quarantined = len(validator.get_quarantined())
+    df = validator.get_valid()
+    if df.empty:
+        raise HTTPException(status_code=422, detail={
+            'message': 'No valid rows', 'rows_quarantined': rows_quarantined, 'violations': counts,
+        })
+
+    processor = profiler.instrument(DataProcessor(df))
 
     processor.add_converted_column()
     processor.add_state_abbreviation_column()
@@ -102,6 +417,15 @@ def process_data(data_input: DataInput):
     processor.add_85_percentile_nationality()
     processor.fill_in_missing_with_median('time_spent_seconds')
 
+    # Flag outliers and drift against the batches received so far
+    with profiler.step('detect_anomalies'):
+        report = update_anomaly_baselines(processor.data)
+    # Rows keep their position in the input through validation and processing
+    outliers = {
+        column: processor.data.index[processor.data[column + '_outlier'] == 1].tolist()
+        for column in report['outliers']
+    }
+
     # Uncomment these lines to save the plots
     # processor.store_plot(processor.get_boxplot('purchase'), 'boxplot_purchase.png')
     # fig = processor.plot_and_save_histograms(['purchase', 'time_spent_seconds'])
@@ -110,45 +434,190 @@ def process_data(data_input: DataInput):
     db = DatabaseConnection()
     db.connect()
 
-    for _, row in processor.data.iterrows():
-        data = {
-            'ip_address': row['ip_address'],
-            'marketing_channel': row['marketing_channel'],
-            'purchase': row['purchase'],
-            'state': row['state'],
-            'time_spent_seconds': row['time_spent_seconds'],
-            'converted': row['converted'],
-            'state_abbreviation': row['state_abbreviation'],
-            'purchase_normalized': row['purchase_normalized'],
-            'percentile_85_state': row['percentile_85_state'],
-            'percentile_85_national': row['percentile_85_national']
-        }
-        db.add_row('processed_data', {k: None if pd.isna(v) else v for k, v in data.items()})
-
-    db.close()
-
-    return {"message": "Data processed and stored successfully"}
+    with profiler.step('store'):
+        for _, row in processor.data.iterrows():
+            data = {
+                'ip_address': row['ip_address'],
+                'marketing_channel': row['marketing_channel'],
+                'purchase': row['purchase'],
+                'state': row['state'],
+                'time_spent_seconds': row['time_spent_seconds'],
+                'converted': row['converted'],
+                'state_abbreviation': row['state_abbreviation'],
+                'purchase_normalized': row['purchase_normalized'],
+                'percentile_85_state': row['percentile_85_state'],
+                'percentile_85_national': row['percentile_85_national']
+            }
+            db.add_row('processed_data', {k: None if pd.isna(v) else v for k, v in data.items()})
+
+    # Readers must not keep serving responses cached before this write, so a
+    # failure to bump the version fails the request
+    try:
+        table_versions.set('processed_data', db.bump_table_version('processed_data'))
+    finally:
+        db.close()
+
+    return {
+        "message": "Data processed and stored successfully",
+        "rows_quarantined": rows_quarantined,
+        "violations": counts,
+        "outliers": outliers,
+    }
 
 @app.get("/data/")
-def get_data():
+def get_data(request: Request):
     """
     Retrieves all data from the database.
 
+    The format is negotiated from the ``format`` query parameter or the
+    ``Accept`` header (see ``exporters.FORMATS``); JSON is the default. JSON
+    responses are cached until the next write to ``processed_data``; the bulk
+    formats are streamed and compressed according to ``Accept-Encoding``. All
+    formats support conditional requests through ``ETag``/``If-None-Match``.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+
     Returns
     -------
     List[dict]
         A list of dictionaries representing the rows of data in the database.
+
+    Raises
+    ------
+    HTTPException
+        406 if the requested format is not supported.
     """
-    db = DatabaseConnection()
-    db.connect()
-    query = 'SELECT * FROM processed_data'
-    data = db.fetch_data(query)
-    db.close()
+    try:
+        export_format = negotiate_format(request.headers.get('accept'), request.query_params.get('format'))
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    if export_format == 'arrow' and not is_available('pyarrow'):
+        raise HTTPException(status_code=406, detail='Arrow output requires pyarrow to be installed')
+    if export_format != 'json':
+        return export_response(request, 'processed_data', 'SELECT * FROM processed_data', export_format)
+
+    def build():
+        db = DatabaseConnection()
+        db.connect()
+        query = 'SELECT * FROM processed_data'
+        data = db.fetch_data(query)
+        db.close()
+
+        # Convert data to a format that handles NaN values
+        return [
+            {k: None if is_missing(v) else v for k, v in row.items()}
+            for row in data
+        ]
+
+    return cached_json_response(request, 'processed_data', build)
+
+@app.get("/anomalies/")
+def get_anomalies():
+    """
+    Returns the outlier and drift report of the last batch sent to /process_data/.
 
-    # Convert data to a format that handles NaN values
-    sanitized_data = [
-        {k: None if pd.isna(v) else v for k, v in row.items()}
-        for row in data
-    ]
+    Returns
+    -------
+    dict
+        The number of batches processed and the report of the last one.
+    """
+    detector = anomaly_state.read() if anomaly_state is not None else anomaly_detector
+    if detector is None:
+        return {'batches': 0, 'last_report': None}
+    return {'batches': detector.batches, 'last_report': detector.last_report}
+
+def analytics_response(request: Request, by: List[str], confidence: float, n_bootstrap: int) -> Response:
+    """
+    Returns the attribution metrics of the cohorts defined by some columns.
+
+    The metrics are computed over all rows of processed_data, read in batches,
+    and cached until the next write to the table.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    by : List[str]
+        The columns defining the cohorts.
+    confidence : float
+        The confidence level of the intervals.
+    n_bootstrap : int
+        The number of bootstrap resamples; 0 disables the bootstrap intervals.
+
+    Returns
+    -------
+    Response
+        The JSON response, or an empty 304 response.
+    """
+    def build():
+        from analytics import AttributionEngine
+
+        engine = AttributionEngine(
+            confidence=confidence, n_bootstrap=n_bootstrap, workers=config.ANALYTICS_WORKERS, seed=0
+        )
+        db = DatabaseConnection()
+        db.connect()
+        try:
+            engine.load_from_database(db, batch_size=config.EXPORT_BATCH_SIZE)
+        finally:
+            db.close()
+
+        return [
+            {k: None if is_missing(v) else v for k, v in row.items()}
+            for row in engine.summary(by).to_dict('records')
+        ]
+
+    return cached_json_response(request, 'processed_data', build)
+
+@app.get("/analytics/cohorts/")
+def get_cohort_analytics(
+    request: Request,
+    confidence: float = Query(0.95, gt=0, lt=1),
+    n_bootstrap: int = Query(1000, ge=0, le=10000),
+):
+    """
+    Returns conversion and revenue metrics with confidence intervals per state and marketing channel.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    confidence : float, optional
+        The confidence level of the intervals (default is 0.95).
+    n_bootstrap : int, optional
+        The number of bootstrap resamples; 0 disables the bootstrap intervals (default is 1000).
+
+    Returns
+    -------
+    List[dict]
+        One dictionary of metrics per cohort.
+    """
+    return analytics_response(request, ['state', 'marketing_channel'], confidence, n_bootstrap)
 
-    return sanitized_data
+@app.get("/analytics/channels/")
+def get_channel_analytics(
+    request: Request,
+    confidence: float = Query(0.95, gt=0, lt=1),
+    n_bootstrap: int = Query(1000, ge=0, le=10000),
+):
+    """
+    Returns conversion and revenue metrics with confidence intervals per marketing channel.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    confidence : float, optional
+        The confidence level of the intervals (default is 0.95).
+    n_bootstrap : int, optional
+        The number of bootstrap resamples; 0 disables the bootstrap intervals (default is 1000).
+
+    Returns
+    -------
+    List[dict]
+        One dictionary of metrics per marketing channel.
+    """
+    return analytics_response(request, ['marketing_channel'], confidence, n_bootstrap)
@@ -0,0 +1,356 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from coordination import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+class TableVersionTracker:
+    """
+    A class to track the write version of database tables.
+
+    The authoritative version of a table lives in the database and is bumped
+    by every writer (the API as well as ``main``). To avoid a database hit on
+    every read, the last known version is reused for ``ttl`` seconds. Writes
+    made by this process update the local version immediately.
+
+    Attributes
+    ----------
+    fetch_version : Callable[[str], int]
+        Function returning the current version of a table from the database.
+    ttl : float
+        Number of seconds a fetched version is considered fresh.
+
+    Methods
+    -------
+    get(table_name: str) -> int
+        Returns the current version of a table.
+    set(table_name: str, version: int) -> None
+        Records a version that is known to be current, e.g. after a write.
+    """
+
+    def __init__(self, fetch_version: Callable[[str], int], ttl: float = 1.0) -> None:
+        """
+        Constructs all the necessary attributes for the TableVersionTracker object.
+
+        Parameters
+        ----------
+        fetch_version : Callable[[str], int]
+            Function returning the current version of a table from the database.
+        ttl : float, optional
+            Number of seconds a fetched version is considered fresh (default is 1.0).
+        """
+        self.fetch_version = fetch_version
+        self.ttl = ttl
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_name: str) -> int:
+        """
+        Returns the current version of a table.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        Returns
+        -------
+        int
+            The last known version of the table.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(table_name)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+
+        version = self.fetch_version(table_name)
+        self.set(table_name, version)
+        return version
+
+    def set(self, table_name: str, version: int) -> None:
+        """
+        Records a version that is known to be current, e.g. after a write.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+        version : int
+            The current version of the table.
+        """
+        with self._lock:
+            self._versions[table_name] = (version, time.monotonic())
+
+class ResponseCache:
+    """
+    A memory-bounded LRU cache of serialized responses.
+
+    Entries are keyed by (endpoint, query parameters, table version), so a
+    write to the table makes all older entries unreachable; they are evicted
+    as new entries push the cache over its size limit.
+
+    Attributes
+    ----------
+    max_bytes : int
+        Maximum total size of the cached response bodies.
+    shared : SharedResponseCache or None
+        A second-level cache shared with the other workers of a server.
+
+    Methods
+    -------
+    make_key(endpoint: str, params: Iterable[Tuple[str, str]], version: int) -> tuple
+        Builds a cache key from an endpoint, its query parameters and a table version.
+    make_etag(key: tuple) -> str
+        Returns the ETag of the response stored under a key.
+    get(key: tuple) -> bytes or None
+        Returns the cached body for a key, or None if it is not cached.
+    put(key: tuple, body: bytes) -> None
+        Stores a body under a key, evicting least recently used entries if needed.
+    clear() -> None
+        Removes all entries from the cache.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, shared: 'SharedResponseCache' = None) -> None:
+        """
+        Constructs all the necessary attributes for the ResponseCache object.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Maximum total size of the cached response bodies (default is 64 MiB).
+        shared : SharedResponseCache, optional
+            A second-level cache shared with the other workers of a server.
+        """
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(endpoint: str, params: Iterable[Tuple[str, str]], version: int) -> tuple:
+        """
+        Builds a cache key from an endpoint, its query parameters and a table version.
+
+        Parameters
+        ----------
+        endpoint : str
+            The path of the endpoint.
+        params : Iterable[Tuple[str, str]]
+            The query parameters of the request as (name, value) pairs.
+        version : int
+            The version of the table the response is derived from.
+
+        Returns
+        -------
+        tuple
+            A hashable cache key.
+        """
+        return (endpoint, tuple(sorted(params)), version)
+
+    @staticmethod
+    def make_etag(key: tuple) -> str:
+        """
+        Returns the ETag of the response stored under a key.
+
+        The ETag only depends on the key, so a matching ``If-None-Match``
+        header can be answered without building or even caching the body.
+
+        Parameters
+        ----------
+        key : tuple
+            A key built by ``make_key``.
+
+        Returns
+        -------
+        str
+            A quoted strong ETag.
+        """
+        digest = hashlib.sha1(repr(key[:2]).encode('utf-8')).hexdigest()[:16]
+        return f'"{digest}-{key[2]}"'
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """
+        Returns the cached body for a key, or None if it is not cached.
+
+        Parameters
+        ----------
+        key : tuple
+            A key built by ``make_key``.
+
+        Returns
+        -------
+        bytes or None
+            The cached response body.
+        """
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+        if self.shared is not None:
+            body = self.shared.get(key)
+            if body is not None:
+                self.put(key, body, share=False)
+        return body
+
+    def put(self, key: tuple, body: bytes, share: bool = True) -> None:
+        """
+        Stores a body under a key, evicting least recently used entries if needed.
+
+        Bodies larger than ``max_bytes`` are not cached.
+
+        Parameters
+        ----------
+        key : tuple
+            A key built by ``make_key``.
+        body : bytes
+            The serialized response body.
+        share : bool, optional
+            Whether to also store the body in the shared cache (default is True).
+        """
+        if share and self.shared is not None:
+            self.shared.put(key, body)
+        size = len(body)
+        if size > self.max_bytes:
+            logger.info(f'Response of {size} bytes exceeds the cache size, not caching.')
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+            self._entries[key] = body
+            self.current_bytes += size
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+class SharedResponseCache:
+    """
+    A size-bounded cache of serialized responses in a directory shared by the workers of a server.
+
+    Every entry is a file named after the digest of its key, written atomically
+    so that workers never read a partial body. On a single host the files are
+    served from the page cache, so a response built by one worker is reused by
+    all others without being rebuilt. When the directory grows above its size
+    limit the least recently used files are removed.
+
+    Attributes
+    ----------
+    directory : str
+        The directory holding the entries.
+    max_bytes : int
+        Maximum total size of the files in the directory.
+
+    Methods
+    -------
+    get(key: tuple) -> bytes or None
+        Returns the cached body for a key, or None if it is not cached.
+    put(key: tuple, body: bytes) -> None
+        Stores a body under a key, evicting least recently used entries if needed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """
+        Constructs all the necessary attributes for the SharedResponseCache object.
+
+        Parameters
+        ----------
+        directory : str
+            The directory holding the entries; created if it does not exist, and
+            required to be private to the current user.
+        max_bytes : int, optional
+            Maximum total size of the files in the directory (default is 256 MiB).
+        """
+        self.directory = ensure_private_dir(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.body')
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """
+        Returns the cached body for a key, or None if it is not cached.
+
+        Parameters
+        ----------
+        key : tuple
+            A key built by ``ResponseCache.make_key``.
+
+        Returns
+        -------
+        bytes or None
+            The cached response body.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        """
+        Stores a body under a key, evicting least recently used entries if needed.
+
+        Parameters
+        ----------
+        key : tuple
+            A key built by ``ResponseCache.make_key``.
+        body : bytes
+            The serialized response body.
+        """
+        if len(body) > self.max_bytes:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.error(f'Error writing shared cache entry: {e}')
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used entries until the directory fits its size limit.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.body'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,58 @@
+"""
+Configuration loading for the application.
+
+This is the single place where the ``.env`` file is read. Every module that
+needs configuration imports this module, so the file is loaded exactly once
+per process no matter which entry point (``api`` or ``main``) is used.
+"""
+import os
+
+from dotenv import find_dotenv, load_dotenv
+
+# Load environment variables from .env file
+load_dotenv(find_dotenv(), override=True)
+
+# Maximum total size in bytes of the cached API responses.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Seconds a table version read from the database is reused before it is checked again.
+CACHE_VERSION_TTL = float(os.environ.get('CACHE_VERSION_TTL', '1.0'))
+
+# Number of rows read from the database at a time by the bulk export formats and the analytics.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '10000'))
+
+# Whether main stores rows in resumable, checkpointed chunks.
+CHECKPOINTED_LOAD = os.environ.get('CHECKPOINTED_LOAD', '').lower() in ('1', 'true', 'yes')
+
+# Number of rows committed at a time by a checkpointed load.
+LOAD_CHUNK_SIZE = int(os.environ.get('LOAD_CHUNK_SIZE', '10000'))
+
+# Number of processes computing bootstrap intervals of the analytics; all CPUs if unset.
+ANALYTICS_WORKERS = int(os.environ['ANALYTICS_WORKERS']) if os.environ.get('ANALYTICS_WORKERS') else None
+
+# Maximum number of pooled database connections per process; 0 opens a connection per DatabaseConnection.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+
+# Seconds to wait for a free pooled database connection.
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+
+# Directory shared by the workers of a server for cached responses and statistics; unset to keep them per worker.
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR') or None
+
+# Quarantine file name main derives one file per input file from; unset to write next to the input file (see main.quarantine_path).
+QUARANTINE_PATH = os.environ.get('QUARANTINE_PATH') or None
+
+# CSV file invalid API rows are appended to.
+API_QUARANTINE_PATH = QUARANTINE_PATH or 'quarantine.csv'
+
+# Whether main and every /process_data/ request are profiled.
+PROFILE = os.environ.get('PROFILE', '').lower() in ('1', 'true', 'yes')
+
+# Whether clients may ask for a profile of their /process_data/ request with ?profile=true.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
+# Profiler used for the whole run: 'sampling' (flamegraph stacks) or 'cprofile'.
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sampling')
+
+# Directory the profiles are written to.
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
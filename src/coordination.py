@@ -0,0 +1,184 @@
+import fcntl
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+def ensure_private_dir(path: str) -> str:
+    """
+    Creates a directory only accessible by the current user, or checks that an existing one is.
+
+    Shared state is read back by every worker, so a directory that another
+    user created or can write to (e.g. a predictable path in /tmp) would let
+    them tamper with it.
+
+    Parameters
+    ----------
+    path : str
+        The path of the directory.
+
+    Returns
+    -------
+    str
+        The path of the directory.
+
+    Raises
+    ------
+    PermissionError
+        If the path is not a directory owned by the current user with no
+        permissions for group and others, or is a symbolic link.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(
+            f'{path} must be a directory owned by the current user and not accessible by other users'
+        )
+    return path
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """
+    Holds an exclusive lock on a file across the processes and threads of a host.
+
+    The lock is taken on a separate ``<path>.lock`` file, so the file itself
+    can be replaced while the lock is held.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file to lock.
+    """
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def dump_json(obj: Any, f) -> None:
+    """
+    Writes a JSON-serializable object to a binary file.
+    """
+    f.write(json.dumps(obj).encode('utf-8'))
+
+class SharedState:
+    """
+    A class to share an object between the processes of a host through a file.
+
+    Updates are serialized by an exclusive file lock, so none of them is lost,
+    and replace the file atomically, so reads need no lock. Every process keeps
+    the last object it read or wrote together with the identity of its file,
+    and only deserializes the file again once another process replaced it.
+    Objects are stored with the given ``dump`` and ``load`` functions (JSON by
+    default), never with pickle, so the file cannot execute code.
+
+    Attributes
+    ----------
+    path : str
+        The path of the state file; its directory must exist.
+    load : Callable
+        Function reading the object from a binary file.
+    dump : Callable
+        Function writing the object to a binary file.
+
+    Methods
+    -------
+    read() -> Any or None
+        Returns the stored object, or None if nothing was stored yet.
+    update(update: Callable[[Optional[Any]], Any]) -> Any
+        Updates the stored object under an exclusive file lock.
+    """
+
+    def __init__(
+        self, path: str, load: Callable[[Any], Any] = json.load, dump: Callable[[Any, Any], None] = dump_json
+    ) -> None:
+        """
+        Constructs all the necessary attributes for the SharedState object.
+
+        Parameters
+        ----------
+        path : str
+            The path of the state file; its directory must exist.
+        load : Callable, optional
+            Function reading the object from a binary file (default is JSON).
+        dump : Callable, optional
+            Function writing the object to a binary file (default is JSON).
+        """
+        self.path = path
+        self.load = load
+        self.dump = dump
+        self._object = None
+        self._identity: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_identity(st: os.stat_result) -> Tuple[int, int, int]:
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> Optional[Any]:
+        """
+        Returns the stored object, deserializing it only if the file changed since it was last seen.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            identity = self._file_identity(os.fstat(f.fileno()))
+            if identity != self._identity:
+                self._object = self.load(f)
+                self._identity = identity
+        return self._object
+
+    def read(self) -> Optional[Any]:
+        """
+        Returns the stored object, or None if nothing was stored yet.
+
+        The object is shared with later calls of this process and must not be modified.
+
+        Returns
+        -------
+        Any or None
+            The stored object.
+        """
+        with self._lock:
+            return self._read()
+
+    def update(self, update: Callable[[Optional[Any]], Any]) -> Any:
+        """
+        Updates the stored object under an exclusive file lock.
+
+        Parameters
+        ----------
+        update : Callable[[Optional[Any]], Any]
+            Function receiving the stored object (None if nothing was stored
+            yet), which it may modify in place, and returning the object to store.
+
+        Returns
+        -------
+        Any
+            The stored object.
+        """
+        with self._lock, locked(self.path):
+            try:
+                state = update(self._read())
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        self.dump(state, f)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                # The lock is held, so the file is still the one just written
+                self._object = state
+                self._identity = self._file_identity(os.stat(self.path))
+                return state
+            except BaseException:
+                self._object = self._identity = None
+                raise
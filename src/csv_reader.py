@@ -1,5 +1,9 @@
+import logging
+
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 class CSVReader:
     """
     A class to read CSV files and load them into a pandas DataFrame.
@@ -37,7 +41,7 @@ class CSVReader:
 
         This method attempts to read a CSV file from the path specified during 
         the initialization of the object and stores it in the dataframe attribute. 
-        It handles various exceptions that may occur during this process.
+        Errors are logged and re-raised, so that a run does not continue without data.
         
         Raises
         ------
@@ -52,15 +56,19 @@ class CSVReader:
         """
         try:
             self.dataframe = pd.read_csv(self.file_path)
-            print(f"Data loaded successfully from {self.file_path}")
+            logger.info(f"Data loaded successfully from {self.file_path}")
         except FileNotFoundError:
-            print(f"File not found: {self.file_path}")
+            logger.error(f"File not found: {self.file_path}")
+            raise
         except pd.errors.EmptyDataError:
-            print(f"No data: {self.file_path}")
+            logger.error(f"No data: {self.file_path}")
+            raise
         except pd.errors.ParserError:
-            print(f"Parse error: {self.file_path}")
+            logger.error(f"Parse error: {self.file_path}")
+            raise
         except Exception as e:
-            print(f"An error occurred: {e}")
+            logger.error(f"An error occurred: {e}")
+            raise
 
     def get_dataframe(self) -> pd.DataFrame:
         """
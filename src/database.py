@@ -1,17 +1,176 @@
 import logging
 import os
+import threading
 import traceback
 
 import psycopg2
-from dotenv import find_dotenv, load_dotenv
+import psycopg2.pool
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
-# Load environment variables from .env file
-load_dotenv(find_dotenv(), override=True)
+import config
 
 logger = logging.getLogger(__name__)
 
+class ConnectionPool:
+    """
+    A thread-safe pool of database connections that is safe to inherit across fork.
+
+    Connections are opened lazily by the process that uses them. A process
+    forked from the one that created the pool (e.g. a worker of a server
+    started with ``--preload``) opens its own connections and keeps the
+    inherited pool referenced but unused, so that the connections it shares
+    with the parent are never closed from the child, which would end the
+    parent's sessions.
+
+    Attributes
+    ----------
+    db_url : str
+        The database URL.
+    maxconn : int
+        The maximum number of connections of a process.
+    timeout : float
+        The number of seconds to wait for a free connection.
+
+    Methods
+    -------
+    getconn() -> psycopg2.extensions.connection
+        Takes a connection from the pool, waiting for one to be returned if all are in use.
+    putconn(connection: psycopg2.extensions.connection) -> None
+        Returns a connection to the pool.
+    closeall() -> None
+        Closes all connections of the pool.
+    """
+
+    def __init__(self, db_url: str, maxconn: int, timeout: float = 30.0) -> None:
+        """
+        Constructs all the necessary attributes for the ConnectionPool object.
+
+        Parameters
+        ----------
+        db_url : str
+            The database URL.
+        maxconn : int
+            The maximum number of connections of a process.
+        timeout : float, optional
+            The number of seconds to wait for a free connection (default is 30.0).
+        """
+        self.db_url = db_url
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = None
+        self._available = None
+        self._inherited = []
+
+    def _current(self):
+        """
+        Returns the pool of the current process, creating it after a fork.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pool is not None:
+                    self._inherited.append(self._pool)
+                self._pool = psycopg2.pool.ThreadedConnectionPool(0, self.maxconn, self.db_url)
+                # Connections are opened on demand, but the pool only keeps
+                # returned connections open while it holds fewer than minconn
+                self._pool.minconn = self.maxconn
+                self._available = threading.BoundedSemaphore(self.maxconn)
+                self._pid = os.getpid()
+            return self._pool, self._available
+
+    def getconn(self):
+        """
+        Takes a connection from the pool, waiting for one to be returned if all are in use.
+
+        Returns
+        -------
+        psycopg2.extensions.connection
+            An open connection.
+
+        Raises
+        ------
+        psycopg2.pool.PoolError
+            If no connection was returned within the timeout.
+        psycopg2.Error
+            If a new connection could not be opened.
+        """
+        pool, available = self._current()
+        if not available.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError('Timed out waiting for a database connection.')
+        try:
+            return pool.getconn()
+        except Exception:
+            available.release()
+            raise
+
+    def putconn(self, connection) -> None:
+        """
+        Returns a connection to the pool.
+
+        Any open transaction is rolled back, and broken connections are closed
+        instead of being reused.
+
+        Parameters
+        ----------
+        connection : psycopg2.extensions.connection
+            A connection taken from the pool by this process.
+        """
+        pool, available = self._current()
+        try:
+            if not connection.closed:
+                connection.rollback()
+        except psycopg2.Error:
+            pass
+        try:
+            pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            available.release()
+
+    def closeall(self) -> None:
+        """
+        Closes all connections of the pool.
+        """
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pid = None
+            self._pool = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns the connection pool of the application, or None if pooling is disabled.
+
+    Pooling is enabled by setting ``DB_POOL_SIZE`` to the maximum number of
+    connections per process.
+
+    Returns
+    -------
+    ConnectionPool or None
+        The pool shared by all DatabaseConnection objects of the process.
+    """
+    global _pool
+    if config.DB_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                os.environ.get('DATABASE_URL'), config.DB_POOL_SIZE, config.DB_POOL_TIMEOUT
+            )
+        return _pool
+
+def close_pool() -> None:
+    """
+    Closes all pooled connections of the current process, e.g. when a worker shuts down.
+    """
+    if _pool is not None:
+        _pool.closeall()
+        logger.info('Database connection pool closed.')
+
 class DatabaseConnection:
     """
     A class to handle database connections and operations.
@@ -22,6 +181,8 @@ class DatabaseConnection:
         The database URL from the environment variables.
     connection : psycopg2.extensions.connection
         The connection object to the PostgreSQL database.
+    pool : ConnectionPool or None
+        The pool connections are taken from, if pooling is enabled.
 
     Methods
     -------
@@ -31,10 +192,24 @@ class DatabaseConnection:
         Closes the database connection.
     fetch_data(query, params=None):
         Fetches data from the database based on the provided SQL query and parameters.
+    fetch_batches(query, params=None, batch_size=10000):
+        Fetches data in batches of row tuples through a server-side cursor.
     add_row(table_name: str, data: dict, return_id: str = 'id') -> int:
         Adds a row to the specified table in the database and returns the ID of the new row.
+    add_rows(table_name: str, rows: list, commit: bool = True) -> int:
+        Adds several rows to the specified table in a single statement and returns their count.
+    commit():
+        Commits the current transaction.
     delete_row(table_name: str, row_id: int):
         Deletes a row from the specified table in the database based on the provided row ID.
+    get_table_version(table_name: str) -> int:
+        Returns the write version of the specified table.
+    bump_table_version(table_name: str, commit: bool = True) -> int:
+        Increments the write version of the specified table and returns the new version.
+    get_load_checkpoint(fingerprint: str) -> dict:
+        Returns the checkpoint of a checkpointed load, or None if the file was never loaded.
+    save_load_checkpoint(fingerprint: str, file_path: str, rows_committed: int, total_rows: int, commit: bool = True):
+        Records the progress of a checkpointed load.
     """
 
     def __init__(self):
@@ -44,15 +219,20 @@ class DatabaseConnection:
         """
         self.db_url = os.environ.get('DATABASE_URL')
         self.connection = None
+        self.pool = get_pool()
 
     def connect(self):
         """
         Establishes a connection to the database using the database URL.
 
+        If pooling is enabled, the connection is taken from the pool instead.
         Logs a message indicating whether the connection was successful or if an error occurred.
         """
         try:
-            self.connection = psycopg2.connect(self.db_url)
+            if self.pool is not None:
+                self.connection = self.pool.getconn()
+            else:
+                self.connection = psycopg2.connect(self.db_url)
             logger.info('Connected to the database successfully.')
         except psycopg2.Error as e:
             logger.error(f'Error connecting to the database: {e}')
@@ -62,10 +242,15 @@ class DatabaseConnection:
         """
         Closes the database connection if it is open.
 
+        Pooled connections are returned to the pool instead of being closed.
         Logs a message indicating that the connection has been closed.
         """
         if self.connection:
-            self.connection.close()
+            if self.pool is not None:
+                self.pool.putconn(self.connection)
+            else:
+                self.connection.close()
+            self.connection = None
             logger.info('Database connection closed.')
 
     def fetch_data(self, query, params=None):
@@ -106,6 +291,62 @@ class DatabaseConnection:
             if cursor:
                 cursor.close()
 
+    def fetch_batches(self, query, params=None, batch_size=10000):
+        """
+        Fetches data in batches of row tuples through a server-side cursor.
+
+        Only one batch is held in memory at a time, so arbitrarily large results
+        can be streamed. The first batch is fetched eagerly so that the column
+        description is available before iteration starts.
+
+        Parameters
+        ----------
+        query : str
+            The SQL query to be executed.
+        params : tuple, optional
+            The parameters to be used in the SQL query.
+        batch_size : int, optional
+            The number of rows per batch (default is 10000).
+
+        Returns
+        -------
+        tuple
+            The cursor description (columns with ``name`` and ``type_code``) and
+            a generator over lists of row tuples.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        cursor = self.connection.cursor(name='fetch_batches')
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(query, params)
+            first = cursor.fetchmany(batch_size)
+            description = cursor.description
+        except psycopg2.Error as e:
+            logger.error(f'Error fetching data: {e}')
+            cursor.close()
+            self.connection.rollback()
+            raise
+
+        def batches():
+            try:
+                rows = first
+                while rows:
+                    yield rows
+                    rows = cursor.fetchmany(batch_size)
+                logger.info('Data fetched successfully.')
+            finally:
+                cursor.close()
+                self.connection.rollback()
+
+        return description, batches()
+
     def add_row(self, table_name: str, data: dict, return_id: str = 'id') -> int:
         """
         Adds a row to the specified table in the database and returns the ID of the new row.
@@ -157,6 +398,71 @@ class DatabaseConnection:
             if cursor:
                 cursor.close()
 
+    def add_rows(self, table_name: str, rows: list, commit: bool = True) -> int:
+        """
+        Adds several rows to the specified table in a single statement and returns their count.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table where the rows should be added.
+        rows : list of dict
+            The rows to be added. All rows must have the same keys.
+        commit : bool, optional
+            Whether to commit the transaction (default is True). Pass False to
+            commit the rows together with other writes through ``commit``.
+
+        Returns
+        -------
+        int
+            The number of rows added, or None if the insert failed.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        if not rows:
+            return 0
+        cursor = None
+        try:
+            columns = list(rows[0].keys())
+            query = sql.SQL('INSERT INTO {table} ({fields}) VALUES %s').format(
+                table=sql.Identifier(table_name),
+                fields=sql.SQL(', ').join(map(sql.Identifier, columns)),
+            )
+            cursor = self.connection.cursor()
+            execute_values(
+                cursor, query, [[row[column] for column in columns] for row in rows], page_size=len(rows)
+            )
+            if commit:
+                self.connection.commit()
+            return len(rows)
+        except psycopg2.Error as e:
+            logger.error(f'Error adding data @{table_name}: {e}')
+            self.connection.rollback()
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+
+    def commit(self) -> None:
+        """
+        Commits the current transaction.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        self.connection.commit()
+
     def delete_row(self, table_name: str, row_id: int) -> None:
         """
         Deletes a row from the specified table in the database based on the provided row ID.
@@ -190,3 +496,187 @@ class DatabaseConnection:
         finally:
             if cursor:
                 cursor.close()
+
+    def get_table_version(self, table_name: str) -> int:
+        """
+        Returns the write version of the specified table.
+
+        The version is stored in the ``table_versions`` table and is 0 for
+        tables that have never been written through ``bump_table_version``.
+        Unlike ``fetch_data``, errors are raised rather than logged, so that a
+        failed lookup is never mistaken for version 0.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table.
+
+        Returns
+        -------
+        int
+            The current version of the table.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        psycopg2.Error
+            If the version could not be read, e.g. because the ``table_versions``
+            table does not exist.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute('SELECT version FROM table_versions WHERE table_name = %s', (table_name,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except psycopg2.Error as e:
+            logger.error(f'Error fetching version @{table_name}: {e}')
+            self.connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
+    def bump_table_version(self, table_name: str, commit: bool = True) -> int:
+        """
+        Increments the write version of the specified table and returns the new version.
+
+        Writers call this once after a batch of writes so that readers can
+        invalidate anything derived from the table.
+
+        Parameters
+        ----------
+        table_name : str
+            The name of the table that was written.
+        commit : bool, optional
+            Whether to commit the transaction (default is True). Pass False to
+            commit the new version atomically with the writes it covers.
+
+        Returns
+        -------
+        int
+            The new version of the table.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        psycopg2.Error
+            If the version could not be incremented.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                'INSERT INTO table_versions (table_name, version) VALUES (%s, 1) '
+                'ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1 '
+                'RETURNING version',
+                (table_name,),
+            )
+            version = cursor.fetchone()[0]
+            if commit:
+                self.connection.commit()
+            return version
+        except psycopg2.Error as e:
+            logger.error(f'Error bumping version @{table_name}: {e}')
+            self.connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
+    def get_load_checkpoint(self, fingerprint: str) -> dict:
+        """
+        Returns the checkpoint of a checkpointed load, or None if the file was never loaded.
+
+        Errors are raised rather than logged, so that a failed lookup never
+        restarts a load from the first row.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The fingerprint of the loaded file.
+
+        Returns
+        -------
+        dict
+            The row of the ``load_checkpoints`` table.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection.
+        psycopg2.Error
+            If the checkpoint could not be read.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        cursor = None
+        try:
+            cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute('SELECT * FROM load_checkpoints WHERE fingerprint = %s', (fingerprint,))
+            return cursor.fetchone()
+        except psycopg2.Error as e:
+            logger.error(f'Error fetching load checkpoint: {e}')
+            self.connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
+    def save_load_checkpoint(
+        self, fingerprint: str, file_path: str, rows_committed: int, total_rows: int, commit: bool = True
+    ) -> None:
+        """
+        Records the progress of a checkpointed load.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The fingerprint of the loaded file.
+        file_path : str
+            The path of the loaded file.
+        rows_committed : int
+            The number of rows committed so far.
+        total_rows : int
+            The number of rows in the file.
+        commit : bool, optional
+            Whether to commit the transaction (default is True). Pass False to
+            commit the checkpoint atomically with the rows it covers.
+
+        Raises
+        ------
+        Exception
+            If there is no database connection or the checkpoint could not be saved.
+        """
+        if not self.connection:
+            logger.error('No database connection.')
+            raise Exception('No database connection.')
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                'INSERT INTO load_checkpoints (fingerprint, file_path, rows_committed, total_rows, completed) '
+                'VALUES (%s, %s, %s, %s, %s) '
+                'ON CONFLICT (fingerprint) DO UPDATE SET file_path = EXCLUDED.file_path, '
+                'rows_committed = EXCLUDED.rows_committed, total_rows = EXCLUDED.total_rows, '
+                'completed = EXCLUDED.completed',
+                (fingerprint, file_path, rows_committed, total_rows, rows_committed >= total_rows),
+            )
+            if commit:
+                self.connection.commit()
+        except psycopg2.Error as e:
+            logger.error(f'Error saving load checkpoint: {e}')
+            self.connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
@@ -0,0 +1,265 @@
+import importlib.util
+import io
+import json
+import math
+import zlib
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+# Media types of the supported export formats, keyed by the name accepted in the
+# ``format`` query parameter.
+FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/vnd.attributy.columnar+json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Content encodings in order of preference.
+ENCODINGS = ['zstd', 'gzip', 'identity']
+
+# Arrow types of the PostgreSQL column types, keyed by type OID.
+ARROW_TYPES = {
+    16: 'bool_',
+    20: 'int64',
+    21: 'int16',
+    23: 'int32',
+    700: 'float32',
+    701: 'float64',
+}
+
+def is_missing(value: Any) -> bool:
+    """
+    Checks whether a value read from the database is missing.
+
+    This replaces ``pd.isna`` for scalar values so that serving reads does
+    not require pandas to be imported.
+
+    Parameters
+    ----------
+    value : Any
+        The value to check.
+
+    Returns
+    -------
+    bool
+        True if the value is None or NaN.
+    """
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    Selects the export format of a response.
+
+    Parameters
+    ----------
+    accept : str, optional
+        The ``Accept`` header of the request.
+    requested : str, optional
+        The format named in the ``format`` query parameter, which takes precedence.
+
+    Returns
+    -------
+    str
+        One of the keys of ``FORMATS``; 'json' if nothing more specific was asked for.
+
+    Raises
+    ------
+    ValueError
+        If the requested format is not supported.
+    """
+    if requested is not None:
+        if requested not in FORMATS:
+            raise ValueError(f'Unsupported format: {requested}')
+        return requested
+    if accept:
+        media_types = [part.split(';')[0].strip() for part in accept.split(',')]
+        for name, media_type in FORMATS.items():
+            if media_type in media_types:
+                return name
+    return 'json'
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Selects the content encoding of a response from the ``Accept-Encoding`` header.
+
+    zstd is only offered if the ``zstandard`` package is installed.
+
+    Parameters
+    ----------
+    accept_encoding : str, optional
+        The ``Accept-Encoding`` header of the request.
+
+    Returns
+    -------
+    str
+        'zstd', 'gzip' or 'identity'.
+    """
+    if not accept_encoding:
+        return 'identity'
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding == 'zstd' and not is_available('zstandard'):
+            continue
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return 'identity'
+
+def is_available(module: str) -> bool:
+    """
+    Checks whether an optional dependency is installed without importing it.
+
+    Parameters
+    ----------
+    module : str
+        The name of the module, e.g. 'pyarrow' or 'zstandard'.
+
+    Returns
+    -------
+    bool
+        True if the module can be imported.
+    """
+    return importlib.util.find_spec(module) is not None
+
+def encode_ndjson(columns: Sequence, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as newline-delimited JSON, one object per row.
+
+    Parameters
+    ----------
+    columns : Sequence
+        The cursor description of the rows.
+    batches : Iterable[List[tuple]]
+        Batches of rows as returned by ``DatabaseConnection.fetch_batches``.
+
+    Yields
+    ------
+    bytes
+        The encoded rows of one batch.
+    """
+    names = [column.name for column in columns]
+    for rows in batches:
+        if not rows:
+            continue
+        lines = [
+            json.dumps({k: None if is_missing(v) else v for k, v in zip(names, row)})
+            for row in rows
+        ]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def encode_columnar_json(columns: Sequence, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as a single JSON object mapping each column to its values.
+
+    The output can be loaded with ``pd.DataFrame(json.loads(body))``. Unlike the
+    other formats the whole result is collected before it is encoded.
+
+    Parameters
+    ----------
+    columns : Sequence
+        The cursor description of the rows.
+    batches : Iterable[List[tuple]]
+        Batches of rows as returned by ``DatabaseConnection.fetch_batches``.
+
+    Yields
+    ------
+    bytes
+        The encoded object.
+    """
+    names = [column.name for column in columns]
+    values = {name: [] for name in names}
+    for rows in batches:
+        for name, column_values in zip(names, zip(*rows)):
+            values[name].extend(None if is_missing(v) else v for v in column_values)
+    yield json.dumps(values).encode('utf-8')
+
+def encode_arrow(columns: Sequence, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as an Arrow IPC stream, one record batch per batch.
+
+    The output can be loaded with ``pyarrow.ipc.open_stream(body).read_pandas()``.
+    Requires the optional ``pyarrow`` package.
+
+    Parameters
+    ----------
+    columns : Sequence
+        The cursor description of the rows.
+    batches : Iterable[List[tuple]]
+        Batches of rows as returned by ``DatabaseConnection.fetch_batches``.
+
+    Yields
+    ------
+    bytes
+        The stream header, followed by one encoded record batch per batch.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema([
+        (column.name, getattr(pa, ARROW_TYPES.get(column.type_code, 'string'))())
+        for column in columns
+    ])
+    buffer = io.BytesIO()
+    writer = pa.ipc.new_stream(pa.PythonFile(buffer, mode='w'), schema)
+
+    def drain() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    yield drain()
+    for rows in batches:
+        if not rows:
+            continue
+        arrays = [
+            pa.array(
+                column_values if field.type != pa.string()
+                else [None if v is None else str(v) for v in column_values],
+                type=field.type,
+            )
+            for field, column_values in zip(schema, zip(*rows))
+        ]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+def compress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks with the given content encoding.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The uncompressed chunks.
+    encoding : str
+        'zstd', 'gzip' or 'identity'.
+
+    Yields
+    ------
+    bytes
+        The compressed chunks.
+    """
+    if encoding == 'identity':
+        yield from chunks
+        return
+    if encoding == 'zstd':
+        import zstandard
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+ENCODERS = {
+    'ndjson': encode_ndjson,
+    'columnar': encode_columnar_json,
+    'arrow': encode_arrow,
+}
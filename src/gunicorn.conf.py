@@ -0,0 +1,46 @@
+"""
+Multi-worker server configuration.
+
+Run from the src directory with:
+
+    gunicorn -c gunicorn.conf.py api:app
+
+The application is imported once in the master and forked into the workers
+(``preload_app``). Database connections are pooled per worker and opened after
+the fork, and cached responses and anomaly baselines are shared by the
+workers through ``SHARED_STATE_DIR``. On SIGTERM or SIGHUP the workers stop
+accepting connections and finish their in-flight requests within
+``graceful_timeout`` before closing their pooled connections.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Set before the application (and its config module) is imported
+os.environ.setdefault('DB_POOL_SIZE', '10')
+# A per-user directory, created private and refused if another user owns it
+os.environ.setdefault('SHARED_STATE_DIR', os.path.join(tempfile.gettempdir(), f'attributy-{os.getuid()}'))
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Every worker keeps its own bootstrap process pool, so they share the CPUs between them
+os.environ.setdefault('ANALYTICS_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+worker_class = 'uvicorn_worker.UvicornWorker'
+preload_app = True
+
+# Seconds a worker may take to finish its in-flight requests when it is stopped
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+keepalive = 5
+
+# Recycle workers periodically, staggered so that they are not restarted at once
+max_requests = int(os.environ.get('MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+def worker_exit(server, worker):
+    """
+    Closes the pooled connections of a worker that is exiting.
+    """
+    from database import close_pool
+
+    close_pool()
@@ -0,0 +1,139 @@
+"""
+Local load test of the multi-worker server.
+
+Starts the server with 1 to N workers, sends requests to an endpoint from
+several client processes for a fixed duration and reports the throughput
+and the scaling relative to a single worker. Run from the src directory:
+
+    python loadtest.py --max-workers 4 --path /data/ --header "If-None-Match: <etag>"
+
+The clients run on the same host as the server, so leave enough cores for
+them (``--clients``) when measuring scaling.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+def free_port() -> int:
+    """
+    Returns a free local TCP port.
+    """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(port: int, timeout: float = 30.0) -> None:
+    """
+    Waits until the server accepts connections.
+
+    Raises
+    ------
+    TimeoutError
+        If the server did not start within the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f'Server did not start on port {port}')
+
+def run_client(args: Tuple[int, str, Dict[str, str], float]) -> Tuple[int, int]:
+    """
+    Sends requests over one keep-alive connection until the duration has elapsed.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of successful and failed requests.
+    """
+    port, path, headers, duration = args
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    ok = failed = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status < 400:
+                ok += 1
+            else:
+                failed += 1
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.close()
+    return ok, failed
+
+def measure(workers: int, clients: int, path: str, headers: Dict[str, str], duration: float, warmup: float) -> Tuple[float, int]:
+    """
+    Starts the server with some workers and measures its throughput.
+
+    Returns
+    -------
+    Tuple[float, int]
+        The successful requests per second and the number of failed requests.
+    """
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{port}')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'api:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port)
+        with multiprocessing.Pool(clients) as pool:
+            pool.map(run_client, [(port, path, headers, warmup)] * clients)
+            start = time.monotonic()
+            results = pool.map(run_client, [(port, path, headers, duration)] * clients)
+            elapsed = time.monotonic() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    ok = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    return ok / elapsed, failed
+
+def main(argv: List[str] = None) -> None:
+    """
+    Parses the command line and prints the throughput for each number of workers.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--clients', type=int, default=None, help='client processes (default: 4 per worker)')
+    parser.add_argument('--path', default='/data/')
+    parser.add_argument('--header', action='append', default=[], help='"Name: value", may be repeated')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    headers = dict(header.split(':', 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+
+    cpus = multiprocessing.cpu_count()
+    if args.max_workers > cpus:
+        print(f'Only {cpus} CPUs: throughput cannot scale beyond {cpus} workers on this host', file=sys.stderr)
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'efficiency':>10} {'errors':>7}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        clients = args.clients or 4 * workers
+        throughput, failed = measure(workers, clients, args.path, headers, args.duration, args.warmup)
+        baseline = baseline or throughput
+        speedup = throughput / baseline if baseline else 0.0
+        print(f'{workers:>8} {throughput:>10.1f} {speedup:>8.2f} {speedup / workers:>10.0%} {failed:>7}')
+
+if __name__ == '__main__':
+    main()
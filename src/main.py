@@ -1,14 +1,152 @@
+import hashlib
 import os
+from typing import List
+
 import pandas as pd
+
+import config
+from anomaly import AnomalyDetector
 from csv_reader import CSVReader
 from data_processor import DataProcessor
 from database import DatabaseConnection
-from dotenv import load_dotenv
+from profiling import Profiler
+from validation import DataValidator
+
+# Columns of the processed DataFrame mapped to the columns of the processed_data table
+PROCESSED_COLUMNS = {
+    'ip_address': 'ip_address',
+    'marketing_channel': 'marketing_channel',
+    'purchase': 'purchase',
+    'state': 'state',
+    'time_spent_seconds': 'time_spent_seconds',
+    'converted': 'converted',
+    'state_abbreviation': 'state_abbreviation',
+    'purchase_normalized': 'purchase_normalized',
+    '85th_percentile_state': 'percentile_85_state',
+    '85th_percentile_national': 'percentile_85_national',
+}
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    Computes the fingerprint of a file used to identify it across load attempts.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
 
-# Load environment variables from .env file
-load_dotenv()
+    Returns
+    -------
+    str
+        The hex SHA-256 digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-def main(file_path: str):
+def quarantine_path(file_path: str, fingerprint: str) -> str:
+    """
+    Returns the quarantine file of a loaded file.
+
+    Every input file has its own quarantine file, which each run replaces, so
+    rerunning or resuming a load does not quarantine the same rows twice. With
+    ``QUARANTINE_PATH`` set, the fingerprint of the file is added to its name.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the loaded file.
+    fingerprint : str
+        The fingerprint of the loaded file.
+
+    Returns
+    -------
+    str
+        The path of the quarantine file.
+    """
+    if not config.QUARANTINE_PATH:
+        return file_path + '.quarantine.csv'
+    root, ext = os.path.splitext(config.QUARANTINE_PATH)
+    return f'{root}.{fingerprint[:16]}{ext or ".csv"}'
+
+def to_records(data: pd.DataFrame) -> List[dict]:
+    """
+    Converts processed rows to processed_data records with missing values as None.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The processed rows.
+
+    Returns
+    -------
+    List[dict]
+        One dictionary of native Python values per row.
+    """
+    records = data[list(PROCESSED_COLUMNS)].rename(columns=PROCESSED_COLUMNS).astype(object)
+    return records.where(records.notna(), None).to_dict('records')
+
+def load_checkpointed(
+    db: DatabaseConnection, data: pd.DataFrame, file_path: str, chunk_size: int, fingerprint: str = None
+) -> int:
+    """
+    Stores processed rows in chunks, resuming after the last committed chunk of a previous attempt.
+
+    Each chunk is committed in one transaction together with the checkpoint
+    recording how many rows of the file have been stored and a new version of
+    the table, so after a crash either the whole chunk, its checkpoint and the
+    invalidation of the cached API responses are visible or none is.
+    Processing is deterministic, so the rows of a restarted load line up
+    with the rows of the attempt that was interrupted.
+
+    Parameters
+    ----------
+    db : DatabaseConnection
+        An open database connection.
+    data : pd.DataFrame
+        The processed rows of the file.
+    file_path : str
+        The path to the loaded file.
+    chunk_size : int
+        The number of rows committed at a time.
+    fingerprint : str, optional
+        The fingerprint of the file, computed if omitted.
+
+    Returns
+    -------
+    int
+        The number of rows stored by this attempt.
+
+    Raises
+    ------
+    Exception
+        If a chunk could not be stored.
+    """
+    fingerprint = fingerprint or file_fingerprint(file_path)
+    checkpoint = db.get_load_checkpoint(fingerprint)
+    start = checkpoint['rows_committed'] if checkpoint else 0
+    total = len(data)
+    if start:
+        print(f"Resuming load of {file_path} at row {start} of {total}")
+
+    for offset in range(start, total, chunk_size):
+        records = to_records(data.iloc[offset:offset + chunk_size])
+        if db.add_rows('processed_data', records, commit=False) is None:
+            raise Exception(f'Error storing rows {offset} to {offset + len(records)} of {file_path}')
+        db.save_load_checkpoint(fingerprint, file_path, offset + len(records), total, commit=False)
+        db.bump_table_version('processed_data', commit=False)
+        db.commit()
+
+    return max(total - start, 0)
+
+def main(
+    file_path: str,
+    checkpointed: bool = False,
+    chunk_size: int = config.LOAD_CHUNK_SIZE,
+    profile: bool = config.PROFILE,
+):
     """
     Main function to load, process, and store CSV data.
 
@@ -16,51 +154,93 @@ def main(file_path: str):
     ----------
     file_path : str
         The path to the CSV file to be processed.
+    checkpointed : bool, optional
+        Whether to store the rows in checkpointed chunks so that an interrupted
+        load can be resumed by running it again (default is False).
+    chunk_size : int, optional
+        The number of rows committed at a time in checkpointed mode.
+    profile : bool, optional
+        Whether to profile the run and the memory use of each step, writing
+        the outputs to ``PROFILE_DIR`` (default is the ``PROFILE`` setting).
 
     Returns
     -------
     None
     """
-    # Load the CSV data
-    reader = CSVReader(file_path)
-    reader.load_data()
-    df = reader.get_dataframe()
-
-    # Process the data
-    processor = DataProcessor(df)
-    processor.add_converted_column()
-    processor.add_state_abbreviation_column()
-    processor.add_normalized_column('purchase')
-    processor.add_85_percentile_state()
-    processor.add_85_percentile_nationality()
-    processor.fill_in_missing_with_median('time_spent_seconds')
-
-    # Save plots (commented out)
-    # processor.store_plot(processor.get_boxplot('purchase'), 'boxplot_purchase.png')
-    # fig = processor.plot_and_save_histograms(['purchase', 'time_spent_seconds'])
-    # fig.savefig('histograms.png')
-
-    # Connect to the database and insert data
-    db = DatabaseConnection()
-    db.connect()
-
-    for _, row in processor.data.iterrows():
-        data = {
-            'ip_address': row['ip_address'],
-            'marketing_channel': row['marketing_channel'],
-            'purchase': row['purchase'],
-            'state': row['state'],
-            'time_spent_seconds': row['time_spent_seconds'],
-            'converted': row['converted'],
-            'state_abbreviation': row['state_abbreviation'],
-            'purchase_normalized': row['purchase_normalized'],
-            'percentile_85_state': row['85th_percentile_state'],
-            'percentile_85_national': row['85th_percentile_national']
-        }
-        db.add_row('processed_data', data)
-
-    db.close()
+    profiler = Profiler.create(profile, 'main', config.PROFILE_DIR, config.PROFILE_MODE)
+    with profiler.run():
+        # Load the CSV data
+        reader = CSVReader(file_path)
+        with profiler.step('load_data'):
+            reader.load_data()
+        df = reader.get_dataframe()
+
+        # Validate the data, setting invalid rows aside with their reason codes
+        fingerprint = file_fingerprint(file_path)
+        validator = DataValidator(df)
+        with profiler.step('validate'):
+            counts = validator.validate()
+        quarantined = validator.get_quarantined()
+        path = quarantine_path(file_path, fingerprint)
+        validator.quarantine_to_csv(path, append=False)
+        if not quarantined.empty:
+            violations = ', '.join(f"{code}: {count}" for code, count in counts.items() if count)
+            print(f"Quarantined {len(quarantined)} rows to {path} ({violations})")
+        df = validator.get_valid()
+
+        # Process the data
+        processor = profiler.instrument(DataProcessor(df))
+        processor.add_converted_column()
+        processor.add_state_abbreviation_column()
+        processor.add_normalized_column('purchase')
+        processor.add_85_percentile_state()
+        processor.add_85_percentile_nationality()
+        processor.fill_in_missing_with_median('time_spent_seconds')
+
+        # Flag outliers per state and channel
+        with profiler.step('detect_anomalies'):
+            report = AnomalyDetector().update(processor.data)
+        for column, count in report['outliers'].items():
+            print(f"{count} outliers in {column}")
+
+        # Save plots (commented out)
+        # processor.store_plot(processor.get_boxplot('purchase'), 'boxplot_purchase.png')
+        # fig = processor.plot_and_save_histograms(['purchase', 'time_spent_seconds'])
+        # fig.savefig('histograms.png')
+
+        # Connect to the database and insert data
+        db = DatabaseConnection()
+        db.connect()
+
+        with profiler.step('store'):
+            if checkpointed:
+                # Every chunk invalidates the cached API responses when it is committed
+                load_checkpointed(db, processor.data, file_path, chunk_size, fingerprint)
+            else:
+                try:
+                    for _, row in processor.data.iterrows():
+                        data = {
+                            'ip_address': row['ip_address'],
+                            'marketing_channel': row['marketing_channel'],
+                            'purchase': row['purchase'],
+                            'state': row['state'],
+                            'time_spent_seconds': row['time_spent_seconds'],
+                            'converted': row['converted'],
+                            'state_abbreviation': row['state_abbreviation'],
+                            'purchase_normalized': row['purchase_normalized'],
+                            'percentile_85_state': row['85th_percentile_state'],
+                            'percentile_85_national': row['85th_percentile_national']
+                        }
+                        db.add_row('processed_data', data)
+                finally:
+                    # Invalidate cached API responses derived from the table, also
+                    # when the load fails after some rows have been committed
+                    db.bump_table_version('processed_data')
+
+        db.close()
 
+    if profiler.output_path:
+        print(f"Profile written to {profiler.output_path}.*")
     print("Data processed and stored successfully")
 
 if __name__ == "__main__":
@@ -76,4 +256,4 @@ if __name__ == "__main__":
     #     sys.exit(1)
     
     file_path = "../dataset.csv"
-    main(file_path)
+    main(file_path, checkpointed=config.CHECKPOINTED_LOAD)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Boolean, Column, Integer, String, Float
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -46,3 +46,49 @@ class ProcessedData(Base):
     purchase_normalized = Column(Float)
     percentile_85_state = Column(Integer)
     percentile_85_national = Column(Integer)
+
+class TableVersion(Base):
+    """
+    A class used to represent the write version of a table.
+
+    The version is incremented after each batch of writes to the table and is
+    used by the API to invalidate cached responses.
+
+    Attributes
+    ----------
+    table_name : str
+        Primary key, name of the versioned table.
+    version : int
+        Number of write batches applied to the table.
+    """
+
+    __tablename__ = 'table_versions'
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class LoadCheckpoint(Base):
+    """
+    A class used to represent the progress of a checkpointed CSV load.
+
+    Attributes
+    ----------
+    fingerprint : str
+        Primary key, SHA-256 digest of the loaded file.
+    file_path : str
+        Path of the loaded file.
+    rows_committed : int
+        Number of processed rows committed to the processed_data table.
+    total_rows : int
+        Number of rows in the file.
+    completed : bool
+        Indicates if all rows of the file have been committed.
+    """
+
+    __tablename__ = 'load_checkpoints'
+
+    fingerprint = Column(String(64), primary_key=True)
+    file_path = Column(String(255))
+    rows_committed = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=False)
+    completed = Column(Boolean, nullable=False, default=False)
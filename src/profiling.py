@@ -0,0 +1,350 @@
+import cProfile
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Profiler modes: 'sampling' writes flamegraph stacks, 'cprofile' writes pstats output
+MODES = ('sampling', 'cprofile')
+
+# Held by the profiled run of the process; tracemalloc and its peak are process-wide,
+# so overlapping runs would stop each other's tracing and mix their measurements
+_run_lock = threading.Lock()
+_run_numbers = itertools.count(1)
+
+class ProfilerBusyError(RuntimeError):
+    """
+    Raised when a profiled run starts while another one is in progress in the process.
+    """
+
+class SamplingProfiler:
+    """
+    A class to sample the call stack of a thread at a fixed interval.
+
+    The samples are written in the collapsed stack format ('frame;frame;frame
+    count' per line) read by flamegraph.pl, speedscope and inferno. Sampling
+    runs in a background thread, so the profiled code is not instrumented.
+
+    Attributes
+    ----------
+    interval : float
+        The number of seconds between samples.
+    samples : Counter
+        The number of samples of each collapsed stack.
+
+    Methods
+    -------
+    start() -> None
+        Starts sampling the calling thread.
+    stop() -> None
+        Stops sampling.
+    write_folded(path: str) -> None
+        Writes the samples in collapsed stack format.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """
+        Constructs all the necessary attributes for the SamplingProfiler object.
+
+        Parameters
+        ----------
+        interval : float, optional
+            The number of seconds between samples (default is 0.005).
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        """
+        Starts sampling the calling thread.
+        """
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._sampler = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        self._stopped.set()
+        self._sampler.join()
+
+    def write_folded(self, path: str) -> None:
+        """
+        Writes the samples in collapsed stack format.
+
+        Parameters
+        ----------
+        path : str
+            The path of the output file.
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+class Profiler:
+    """
+    A class to profile a pipeline run and the memory use of its steps.
+
+    The whole run is profiled with the sampling profiler or cProfile, and
+    every step is measured with tracemalloc: its duration, the peak memory
+    allocated while it ran, and the top allocation sites at its end. The
+    outputs are written to one directory per run. Use ``Profiler.create``, which returns
+    a profiler doing nothing when profiling is disabled.
+
+    Attributes
+    ----------
+    name : str
+        The name of the profiled run, used in the output file names.
+    output_dir : str
+        The directory the outputs are written to.
+    mode : str
+        'sampling' or 'cprofile'.
+    interval : float
+        The number of seconds between samples in sampling mode.
+    steps : List[dict]
+        The measurements of the steps run so far.
+    output_path : str or None
+        The path prefix of the outputs of the last run.
+
+    Methods
+    -------
+    create(enabled: bool, name: str, ...) -> Profiler or NullProfiler
+        Returns a profiler if profiling is enabled, and a profiler doing nothing otherwise.
+    run()
+        Context manager profiling a whole run and writing its outputs.
+    step(name: str)
+        Context manager measuring one step of the run.
+    instrument(target)
+        Returns a wrapper of an object measuring each of its method calls as a step.
+    """
+
+    def __init__(self, name: str, output_dir: str, mode: str = 'sampling', interval: float = 0.005) -> None:
+        """
+        Constructs all the necessary attributes for the Profiler object.
+
+        Parameters
+        ----------
+        name : str
+            The name of the profiled run, used in the output file names.
+        output_dir : str
+            The directory the outputs are written to; created if it does not exist.
+        mode : str, optional
+            'sampling' (default) or 'cprofile'.
+        interval : float, optional
+            The number of seconds between samples in sampling mode (default is 0.005).
+
+        Raises
+        ------
+        ValueError
+            If the mode is not supported.
+        """
+        if mode not in MODES:
+            raise ValueError(f'Unsupported profiling mode: {mode}')
+        self.name = name
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.steps: List[Dict[str, Any]] = []
+        self.output_path = None
+
+    @staticmethod
+    def create(enabled: bool, name: str, output_dir: str, mode: str = 'sampling', interval: float = 0.005):
+        """
+        Returns a profiler if profiling is enabled, and a profiler doing nothing otherwise.
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether profiling is enabled.
+        name : str
+            The name of the profiled run, used in the output file names.
+        output_dir : str
+            The directory the outputs are written to.
+        mode : str, optional
+            'sampling' (default) or 'cprofile'.
+        interval : float, optional
+            The number of seconds between samples in sampling mode (default is 0.005).
+
+        Returns
+        -------
+        Profiler or NullProfiler
+            The profiler of the run.
+        """
+        if not enabled:
+            return NULL_PROFILER
+        return Profiler(name, output_dir, mode, interval)
+
+    @contextmanager
+    def run(self):
+        """
+        Context manager profiling a whole run and writing its outputs.
+
+        Writes '<name>-<timestamp>-<pid>-<run>.folded' (sampling mode) or '.prof'
+        (cProfile mode, readable with pstats or snakeviz) and '.memory.json'
+        with the measurements of the steps. Only one run per process is
+        profiled at a time; while it runs, memory tracing also slows down the
+        other threads of the process.
+
+        Raises
+        ------
+        ProfilerBusyError
+            If another profiled run is in progress in the process.
+        """
+        if not _run_lock.acquire(blocking=False):
+            raise ProfilerBusyError('Another profiled run is in progress in this process.')
+        try:
+            yield from self._run()
+        finally:
+            _run_lock.release()
+
+    def _run(self):
+        """
+        Profiles a run once the lock of the process is held; see ``run``.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.output_path = os.path.join(
+            self.output_dir,
+            f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_run_numbers)}",
+        )
+        self.steps = []
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.mode == 'sampling':
+            profiler = SamplingProfiler(self.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            duration = time.perf_counter() - start
+            if self.mode == 'sampling':
+                profiler.stop()
+                profiler.write_folded(self.output_path + '.folded')
+            else:
+                profiler.disable()
+                profiler.dump_stats(self.output_path + '.prof')
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            with open(self.output_path + '.memory.json', 'w') as f:
+                json.dump({'name': self.name, 'duration_seconds': duration, 'steps': self.steps}, f, indent=2)
+            logger.info(f'Profile of {self.name} written to {self.output_path}.* (peak traced memory {peak} bytes)')
+
+    @contextmanager
+    def step(self, name: str):
+        """
+        Context manager measuring one step of the run.
+
+        Parameters
+        ----------
+        name : str
+            The name of the step.
+        """
+        tracemalloc.reset_peak()
+        memory_before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            memory_after, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+            self.steps.append({
+                'step': name,
+                'duration_seconds': duration,
+                'peak_bytes': peak - memory_before,
+                'net_bytes': memory_after - memory_before,
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count} for stat in top
+                ],
+            })
+
+    def instrument(self, target):
+        """
+        Returns a wrapper of an object measuring each of its method calls as a step.
+
+        Parameters
+        ----------
+        target : object
+            The object whose methods are measured, e.g. a DataProcessor.
+
+        Returns
+        -------
+        object
+            A wrapper forwarding attribute access to the target.
+        """
+        return _InstrumentedObject(self, target)
+
+class _InstrumentedObject:
+    """
+    Forwards attribute access to an object, measuring method calls as profiler steps.
+    """
+
+    def __init__(self, profiler: Profiler, target) -> None:
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def measured(*args, **kwargs):
+            with self._profiler.step(name):
+                return attribute(*args, **kwargs)
+
+        return measured
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._target, name, value)
+
+class NullProfiler:
+    """
+    A profiler doing nothing, used when profiling is disabled.
+    """
+
+    output_path = None
+
+    def run(self):
+        return nullcontext(self)
+
+    def step(self, name: str):
+        return nullcontext()
+
+    def instrument(self, target):
+        return target
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,201 @@
+import logging
+import os
+from typing import Dict, Iterable
+
+import pandas as pd
+
+from coordination import locked
+from data_processor import STATE_ABBREVIATIONS
+
+logger = logging.getLogger(__name__)
+
+# Dotted-quad IPv4 address with octets between 0 and 255
+IPV4_PATTERN = r'(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+
+MARKETING_CHANNELS = ('Category A', 'Category B', 'Category C', 'Category D')
+
+class DataValidator:
+    """
+    A class to validate raw rows before they are processed.
+
+    Every rule is evaluated on whole columns and yields a boolean mask of the
+    rows violating it, so validation runs at the speed of the vectorized
+    processing steps. Rows violating any rule are quarantined with the codes of
+    the rules they violate; the remaining rows are returned with 'purchase' and
+    'time_spent_seconds' converted to numbers.
+
+    Reason codes are '<column>_missing' for required values, '<column>_type'
+    for values that are not numbers (or not whole numbers for
+    'time_spent_seconds'), '<column>_range' for numbers outside their range,
+    '<column>_enum' for unknown channels or states and 'ip_address_format' for
+    addresses that are not IPv4 addresses.
+
+    Attributes
+    ----------
+    data : pd.DataFrame
+        The rows to be validated.
+    marketing_channels : Iterable[str]
+        The allowed marketing channels.
+    states : Iterable[str]
+        The allowed state names.
+    max_purchase : float
+        The largest allowed purchase amount; purchases must be positive.
+    max_time_spent_seconds : int
+        The largest allowed time spent on the site; times must not be negative.
+
+    Methods
+    -------
+    validate() -> Dict[str, int]
+        Validates the rows and returns the number of rows violating each rule.
+    get_valid() -> pd.DataFrame
+        Returns the rows that passed validation.
+    get_quarantined() -> pd.DataFrame
+        Returns the rows that failed validation with their reason codes.
+    quarantine_to_csv(path: str, append: bool = True) -> None
+        Writes the quarantined rows to a CSV file.
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        marketing_channels: Iterable[str] = MARKETING_CHANNELS,
+        states: Iterable[str] = tuple(STATE_ABBREVIATIONS),
+        max_purchase: float = 1_000_000.0,
+        max_time_spent_seconds: int = 24 * 60 * 60,
+    ) -> None:
+        """
+        Constructs all the necessary attributes for the DataValidator object.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            The rows to be validated.
+        marketing_channels : Iterable[str], optional
+            The allowed marketing channels.
+        states : Iterable[str], optional
+            The allowed state names (default is the states known to DataProcessor).
+        max_purchase : float, optional
+            The largest allowed purchase amount (default is 1000000).
+        max_time_spent_seconds : int, optional
+            The largest allowed time spent on the site (default is one day).
+        """
+        self.data = data
+        self.marketing_channels = list(marketing_channels)
+        self.states = list(states)
+        self.max_purchase = max_purchase
+        self.max_time_spent_seconds = max_time_spent_seconds
+        self.valid = None
+        self.quarantined = None
+
+    def _masks(self) -> pd.DataFrame:
+        """
+        Evaluates every rule and returns one boolean column of violations per reason code.
+        """
+        data = self.data
+        masks = {}
+
+        for column in ('ip_address', 'marketing_channel', 'state'):
+            masks[column + '_missing'] = data[column].isna().to_numpy()
+
+        purchase_raw = data['purchase']
+        purchase = pd.to_numeric(purchase_raw, errors='coerce')
+        masks['purchase_type'] = (purchase.isna() & purchase_raw.notna()).to_numpy()
+        masks['purchase_range'] = ((purchase <= 0) | (purchase > self.max_purchase)).to_numpy()
+
+        time_raw = data['time_spent_seconds']
+        time_spent = pd.to_numeric(time_raw, errors='coerce')
+        masks['time_spent_seconds_type'] = (
+            (time_spent.isna() & time_raw.notna()) | (time_spent.notna() & (time_spent % 1 != 0))
+        ).to_numpy()
+        masks['time_spent_seconds_range'] = (
+            (time_spent < 0) | (time_spent > self.max_time_spent_seconds)
+        ).to_numpy()
+
+        channel = data['marketing_channel']
+        masks['marketing_channel_enum'] = (channel.notna() & ~channel.isin(self.marketing_channels)).to_numpy()
+        state = data['state']
+        masks['state_enum'] = (state.notna() & ~state.isin(self.states)).to_numpy()
+
+        ip_address = data['ip_address']
+        matches = ip_address.astype(str).str.fullmatch(IPV4_PATTERN).fillna(False).to_numpy(dtype=bool)
+        masks['ip_address_format'] = ip_address.notna().to_numpy() & ~matches
+
+        self._purchase = purchase
+        self._time_spent = time_spent
+        return pd.DataFrame(masks, index=data.index)
+
+    def validate(self) -> Dict[str, int]:
+        """
+        Validates the rows and returns the number of rows violating each rule.
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of violating rows per reason code.
+        """
+        masks = self._masks()
+        invalid = masks.to_numpy().any(axis=1)
+
+        valid = self.data[~invalid].copy()
+        valid['purchase'] = self._purchase[~invalid]
+        valid['time_spent_seconds'] = self._time_spent[~invalid]
+        self.valid = valid
+
+        quarantined = self.data[invalid].copy()
+        quarantined['reason_codes'] = masks[invalid].dot(pd.Index(masks.columns) + ';').str.rstrip(';')
+        self.quarantined = quarantined
+
+        counts = {code: int(count) for code, count in zip(masks.columns, masks.to_numpy().sum(axis=0))}
+        if invalid.any():
+            logger.warning(f'Quarantined {int(invalid.sum())} of {len(self.data)} rows: {counts}')
+        return counts
+
+    def get_valid(self) -> pd.DataFrame:
+        """
+        Returns the rows that passed validation.
+
+        Returns
+        -------
+        pd.DataFrame
+            The valid rows, with numeric 'purchase' and 'time_spent_seconds' columns.
+        """
+        return self.valid
+
+    def get_quarantined(self) -> pd.DataFrame:
+        """
+        Returns the rows that failed validation with their reason codes.
+
+        Returns
+        -------
+        pd.DataFrame
+            The invalid rows with a 'reason_codes' column of ';'-separated codes.
+        """
+        return self.quarantined
+
+    def quarantine_to_csv(self, path: str, append: bool = True) -> None:
+        """
+        Writes the quarantined rows to a CSV file.
+
+        When appending, the header is only written if the file does not exist
+        yet, and appends are serialized by a file lock, so that concurrent
+        requests and server workers do not interleave their rows. Otherwise
+        the file is replaced, or removed if no row was quarantined.
+
+        Parameters
+        ----------
+        path : str
+            The path of the quarantine file.
+        append : bool, optional
+            Whether to append to the file rather than replace it (default is True).
+        """
+        if self.quarantined is None:
+            return
+        if self.quarantined.empty:
+            if not append and os.path.exists(path):
+                os.remove(path)
+            return
+        if append:
+            with locked(path):
+                self.quarantined.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+        else:
+            self.quarantined.to_csv(path, index=False)
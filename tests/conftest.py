@@ -0,0 +1,120 @@
+import os
+import sys
+from collections import namedtuple
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pytest
+
+Column = namedtuple('Column', ['name', 'type_code'])
+
+class FakeDatabaseConnection:
+    """
+    Stands in for DatabaseConnection, keeping rows, checkpoints and table versions in memory.
+
+    ``fetch_data`` returns ``rows`` and ``fetch_batches`` returns ``columns``
+    and ``batches``. Rows added by ``add_rows`` and checkpoints become visible
+    on ``commit``; ``fail_on_chunk`` makes the given call of ``add_rows`` fail.
+    """
+
+    def __init__(self, rows=None, columns=None, batches=None, checkpoints=None, fail_on_chunk=None):
+        self.rows = rows if rows is not None else []
+        self.columns = columns or []
+        self.batches = batches or []
+        self.checkpoints = checkpoints if checkpoints is not None else {}
+        self.fail_on_chunk = fail_on_chunk
+        self.version = 1
+        self.version_error = None
+        self.queries = []
+        self.open_connections = 0
+        self.chunks = 0
+        self.pending_rows = []
+        self.pending_checkpoint = None
+        self.pending_version = None
+
+    def connect(self):
+        self.open_connections += 1
+
+    def close(self):
+        self.open_connections -= 1
+
+    def fetch_data(self, query, params=None):
+        self.queries.append(query)
+        return list(self.rows)
+
+    def fetch_batches(self, query, params=None, batch_size=10000):
+        self.queries.append(query)
+        return [Column(name, type_code) for name, type_code in self.columns], (batch for batch in self.batches)
+
+    def add_row(self, table_name, row):
+        self.add_rows(table_name, [row])
+
+    def add_rows(self, table_name, rows, commit=True):
+        self.chunks += 1
+        if self.chunks == self.fail_on_chunk:
+            raise RuntimeError('worker killed')
+        self.pending_rows.extend(rows)
+        if commit:
+            self.commit()
+        return len(rows)
+
+    def get_load_checkpoint(self, fingerprint):
+        return self.checkpoints.get(fingerprint)
+
+    def save_load_checkpoint(self, fingerprint, file_path, rows_committed, total_rows, commit=True):
+        self.pending_checkpoint = (fingerprint, {'rows_committed': rows_committed, 'total_rows': total_rows})
+        if commit:
+            self.commit()
+
+    def get_table_version(self, table_name):
+        if self.version_error is not None:
+            raise self.version_error
+        return self.version
+
+    def bump_table_version(self, table_name, commit=True):
+        self.pending_version = (self.pending_version or self.version) + 1
+        if commit:
+            self.commit()
+        return self.pending_version
+
+    def commit(self):
+        self.rows.extend(self.pending_rows)
+        self.pending_rows = []
+        if self.pending_checkpoint is not None:
+            fingerprint, checkpoint = self.pending_checkpoint
+            self.checkpoints[fingerprint] = checkpoint
+            self.pending_checkpoint = None
+        if self.pending_version is not None:
+            self.version = self.pending_version
+            self.pending_version = None
+
+@pytest.fixture
+def fake_database():
+    """
+    Returns a factory of FakeDatabaseConnection objects.
+    """
+    return FakeDatabaseConnection
+
+@pytest.fixture
+def api_database(monkeypatch, tmp_path):
+    """
+    Returns a factory of FakeDatabaseConnection objects used by the API.
+
+    The API connects to the created database, reads table versions from it
+    without caching them, starts with an empty response cache and quarantines
+    rows to 'quarantine.csv' in the temporary directory of the test.
+    """
+    import api
+
+    monkeypatch.setattr(api.config, 'API_QUARANTINE_PATH', str(tmp_path / 'quarantine.csv'))
+
+    def create(**kwargs):
+        database = FakeDatabaseConnection(**kwargs)
+        monkeypatch.setattr(api, 'DatabaseConnection', lambda: database)
+        monkeypatch.setattr(api.table_versions, 'fetch_version', database.get_table_version)
+        monkeypatch.setattr(api.table_versions, 'ttl', 0)
+        api.response_cache.clear()
+        return database
+
+    yield create
+    api.response_cache.clear()
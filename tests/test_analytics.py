@@ -0,0 +1,83 @@
+import os
+import sys
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import AttributionEngine, bootstrap_mean_ci
+
+def make_data(size=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    purchase = np.where(rng.random(size) < 0.3, rng.normal(100.0, 10.0, size), np.nan)
+    return pd.DataFrame({
+        'state': rng.choice(['New York', 'California'], size),
+        'marketing_channel': rng.choice(['A', 'B'], size),
+        'converted': (~np.isnan(purchase)).astype(int),
+        'purchase': purchase,
+    })
+
+def test_summary_matches_groupby():
+    data = make_data()
+    engine = AttributionEngine(n_bootstrap=200, workers=1, seed=0)
+    for start in range(0, len(data), 1000):
+        engine.add_batch(data.iloc[start:start + 1000])
+    summary = engine.summary()
+
+    expected = data.groupby(['state', 'marketing_channel'])['converted'].agg(['size', 'mean']).reset_index()
+    assert summary['visitors'].tolist() == expected['size'].tolist()
+    assert np.allclose(summary['conversion_rate'], expected['mean'])
+    assert np.isclose(summary['revenue_share'].sum(), 1.0)
+    assert (summary['conversion_rate_lower'] < summary['conversion_rate']).all()
+    assert (summary['conversion_rate'] < summary['conversion_rate_upper']).all()
+    assert (summary['revenue_per_visitor_lower'] < summary['revenue_per_visitor']).all()
+    assert (summary['revenue_per_visitor'] < summary['revenue_per_visitor_upper']).all()
+
+def test_summary_by_channel():
+    engine = AttributionEngine(n_bootstrap=0)
+    engine.add_batch(make_data())
+    summary = engine.summary(['marketing_channel'])
+    assert summary['marketing_channel'].tolist() == ['A', 'B']
+    assert summary['visitors'].sum() == 3000
+    assert summary['revenue_per_visitor_lower'].isna().all()
+
+def test_parallel_bootstrap_matches_sequential():
+    data = make_data(size=600)
+    sequential = AttributionEngine(n_bootstrap=100, workers=1, seed=3)
+    sequential.add_batch(data)
+    parallel = AttributionEngine(n_bootstrap=100, workers=2, seed=3, min_parallel_draws=0)
+    parallel.add_batch(data)
+    pd.testing.assert_frame_equal(sequential.summary(), parallel.summary())
+
+def test_summary_with_missing_groups():
+    data = make_data(size=600)
+    data['state'] = data['state'].astype(object)
+    data.loc[:9, 'state'] = None
+    data.loc[10:19, 'marketing_channel'] = np.nan
+    engine = AttributionEngine(n_bootstrap=50, workers=1, seed=0)
+    engine.add_batch(data.iloc[:300])
+    engine.add_batch(data.iloc[300:])
+    summary = engine.summary()
+    assert summary['visitors'].sum() == 600
+    assert (summary['state'] == '(missing)').any()
+    assert (summary['marketing_channel'] == '(missing)').any()
+    assert summary['revenue_per_visitor_lower'].notna().any()
+
+def test_parallel_bootstrap_reuses_process_pool():
+    import analytics
+
+    data = make_data(size=600)
+    engine = AttributionEngine(n_bootstrap=50, workers=2, seed=0, min_parallel_draws=0)
+    engine.add_batch(data)
+    engine.summary()
+    executor = analytics._executors[2]
+    other = AttributionEngine(n_bootstrap=50, workers=2, seed=1, min_parallel_draws=0)
+    other.add_batch(data)
+    other.summary()
+    assert analytics._executors[2] is executor
+
+def test_bootstrap_mean_ci_of_constant_values():
+    assert bootstrap_mean_ci(np.full(10, 5.0), 50, 0.9, 0) == pytest.approx((5.0, 5.0))
+    assert np.isnan(bootstrap_mean_ci(np.array([]), 50, 0.9, 0)[0])
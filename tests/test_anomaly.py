@@ -0,0 +1,113 @@
+import os
+import sys
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import numpy as np
+import pandas as pd
+
+from anomaly import AnomalyDetector
+
+def make_batch(rng, size=2000, purchase_mean=100.0, channels=('A', 'B')):
+    return pd.DataFrame({
+        'state': rng.choice(['New York', 'California'], size),
+        'marketing_channel': rng.choice(list(channels), size),
+        'purchase': rng.normal(purchase_mean, 10.0, size),
+        'time_spent_seconds': rng.normal(300.0, 30.0, size),
+    })
+
+def test_update_flags_outliers_against_baseline():
+    rng = np.random.default_rng(0)
+    detector = AnomalyDetector()
+    detector.update(make_batch(rng))
+
+    batch = make_batch(rng, size=100)
+    batch.loc[0, 'purchase'] = 1000.0
+    batch.loc[1, 'purchase'] = None
+    report = detector.update(batch)
+    assert batch.loc[0, 'purchase_outlier'] == 1
+    assert batch.loc[1, 'purchase_outlier'] == 0
+    assert report['outliers']['purchase'] >= 1
+    assert 'time_spent_seconds_outlier' in batch.columns
+
+def test_update_reports_drift():
+    rng = np.random.default_rng(1)
+    detector = AnomalyDetector()
+    first = detector.update(make_batch(rng))
+    assert first['drift']['purchase']['psi'] is None
+
+    report = detector.update(make_batch(rng))
+    assert not report['drift']['purchase']['drifted']
+
+    report = detector.update(make_batch(rng, purchase_mean=130.0))
+    assert report['drift']['purchase']['drifted']
+    assert not report['drift']['time_spent_seconds']['drifted']
+    assert len(report['drift']['purchase']['groups']) == 4
+
+def test_stationary_small_batches_do_not_drift():
+    rng = np.random.default_rng(6)
+    detector = AnomalyDetector()
+    detector.update(make_batch(rng))
+    scored = 0
+    for _ in range(20):
+        report = detector.update(make_batch(rng, size=300))
+        for column in detector.columns:
+            assert report['drift'][column]['groups'] == []
+            assert not report['drift'][column]['drifted']
+            scored += report['drift'][column]['psi'] is not None
+    assert scored > 0
+
+    groups = set()
+    for _ in range(6):
+        report = detector.update(make_batch(rng, size=300, purchase_mean=115.0))
+        groups.update((group['state'], group['marketing_channel']) for group in report['drift']['purchase']['groups'])
+    assert len(groups) == 4
+
+def test_small_first_batch_does_not_fix_sketch():
+    rng = np.random.default_rng(4)
+    detector = AnomalyDetector()
+    report = detector.update(make_batch(rng, size=1))
+    assert report['drift']['purchase']['psi'] is None
+    assert detector._edges['purchase'] is None
+    assert np.isnan(detector.quantile('purchase', 0.5))
+
+    detector.update(make_batch(rng, size=2000))
+    assert len(detector._edges['purchase']) == detector.bins - 1
+    assert abs(detector.quantile('purchase', 0.5) - 100.0) < 2.0
+
+    report = detector.update(make_batch(rng, size=500))
+    assert not report['drift']['purchase']['drifted']
+    report = detector.update(make_batch(rng, size=500, purchase_mean=300.0))
+    assert report['drift']['purchase']['drifted']
+
+def test_state_is_bounded_by_groups():
+    rng = np.random.default_rng(2)
+    detector = AnomalyDetector(bins=16)
+    for _ in range(5):
+        detector.update(make_batch(rng))
+    detector.update(make_batch(rng, channels=('C',)))
+    assert detector._hist['purchase'].shape[0] == 6
+    assert detector._hist['purchase'].shape[1] <= 17
+
+def test_quantile_estimates_baseline():
+    rng = np.random.default_rng(3)
+    detector = AnomalyDetector()
+    detector.update(make_batch(rng, size=20000))
+    assert abs(detector.quantile('purchase', 0.5) - 100.0) < 2.0
+    assert abs(detector.quantile('purchase', 0.85, ('New York', 'A')) - 110.4) < 3.0
+    assert np.isnan(detector.quantile('purchase', 0.5, ('Texas', 'A')))
+
+def test_save_and_load_restore_state(tmp_path):
+    rng = np.random.default_rng(5)
+    detector = AnomalyDetector()
+    detector.update(make_batch(rng))
+    detector.update(make_batch(rng, size=10, channels=('C',)))
+    path = str(tmp_path / 'detector.npz')
+    detector.save(path)
+    restored = AnomalyDetector.load(path)
+
+    assert restored.batches == 2
+    assert restored.last_report == detector.last_report
+    assert restored.quantile('purchase', 0.5) == detector.quantile('purchase', 0.5)
+    batch = make_batch(rng, size=500, purchase_mean=130.0)
+    assert restored.update(batch.copy()) == detector.update(batch.copy())
@@ -21,9 +21,9 @@ def test_process_data():
             "data": [
                 {
                     "ip_address": "192.168.1.1",
-                    "marketing_channel": "A",
+                    "marketing_channel": "Category A",
                     "purchase": 100.0,
-                    "state": "NY",
+                    "state": "New York",
                     "time_spent_seconds": 120,
                     "converted": 1,
                     "state_abbreviation": "NY",
@@ -35,9 +35,131 @@ def test_process_data():
         }
     )
     assert response.status_code == 200
-    assert response.json() == {"message": "Data processed and stored successfully"}
+    assert response.json()["message"] == "Data processed and stored successfully"
+    assert response.json()["rows_quarantined"] == 0
+    assert response.json()["outliers"] == {"purchase": [], "time_spent_seconds": []}
 
 def test_get_data():
     response = client.get("/data/")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_get_data_not_modified(api_database):
+    database = api_database(rows=[{'id': 1, 'purchase': float('nan')}])
+
+    response = client.get("/data/")
+    assert response.status_code == 200
+    assert response.json() == [{'id': 1, 'purchase': None}]
+    etag = response.headers['etag']
+
+    response = client.get("/data/", headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get("/data/")
+    assert response.status_code == 200
+    assert len(database.queries) == 1
+
+    database.version = 2
+    response = client.get("/data/", headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+    assert len(database.queries) == 2
+
+def test_get_data_not_cached_without_version(api_database):
+    database = api_database(rows=[{'id': 1}])
+    database.version_error = Exception('relation "table_versions" does not exist')
+
+    response = client.get("/data/")
+    assert response.status_code == 200
+    assert 'etag' not in response.headers
+    assert response.json() == [{'id': 1}]
+
+    response = client.get("/data/", headers={'If-None-Match': '*'})
+    assert response.status_code == 200
+    assert len(database.queries) == 2
+
+def test_get_data_export_formats(api_database):
+    api_database(columns=[('id', 23), ('purchase', 701)], batches=[[(1, 100.0)], [(2, None)]])
+
+    response = client.get("/data/", headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.text.splitlines() == ['{"id": 1, "purchase": 100.0}', '{"id": 2, "purchase": null}']
+
+    response = client.get("/data/?format=columnar")
+    assert response.json() == {'id': [1, 2], 'purchase': [100.0, None]}
+
+    response = client.get("/data/?format=xml")
+    assert response.status_code == 406
+
+def test_export_connects_only_when_streamed(api_database):
+    import api
+    from starlette.requests import Request
+
+    database = api_database(columns=[('id', 23)], batches=[[(1,)]])
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/data/', 'query_string': b'', 'headers': []})
+    api.export_response(request, 'processed_data', 'SELECT id FROM processed_data', 'ndjson')
+    assert database.open_connections == 0
+    assert database.queries == []
+
+    response = client.get("/data/?format=ndjson")
+    assert response.text.splitlines() == ['{"id": 1}']
+    assert database.open_connections == 0
+
+def test_get_channel_analytics(api_database):
+    api_database(
+        columns=[('state', None), ('marketing_channel', None), ('converted', None), ('purchase', None)],
+        batches=[[('New York', 'A', 1, 100.0), ('New York', 'A', 0, None), ('California', 'B', 1, 50.0)]],
+    )
+
+    response = client.get("/analytics/channels/?n_bootstrap=0")
+    assert response.status_code == 200
+    channels = response.json()
+    assert [row['marketing_channel'] for row in channels] == ['A', 'B']
+    assert channels[0]['conversion_rate'] == 0.5
+    assert channels[0]['revenue_per_visitor_lower'] is None
+
+    response = client.get("/analytics/cohorts/?confidence=2")
+    assert response.status_code == 422
+
+def test_process_data_returns_outliers(monkeypatch, api_database, tmp_path):
+    import api
+    import pandas as pd
+
+    monkeypatch.setattr(api, 'anomaly_detector', None)
+    database = api_database()
+    rows = [
+        {
+            "ip_address": f"192.168.1.{i}",
+            "marketing_channel": "Category A",
+            "purchase": 100.0 + i % 5,
+            "state": "New York",
+            "time_spent_seconds": 120,
+        }
+        for i in range(30)
+    ]
+    rows[0]["ip_address"] = "invalid"
+    rows[7]["purchase"] = 10000.0
+
+    response = client.post("/process_data/", json={"data": rows})
+    assert response.status_code == 200
+    assert response.json()["outliers"] == {"purchase": [7], "time_spent_seconds": []}
+    assert response.json()["rows_quarantined"] == 1
+    assert response.json()["violations"]["ip_address_format"] == 1
+    assert len(database.rows) == 29
+    assert pd.read_csv(tmp_path / 'quarantine.csv')['reason_codes'].tolist() == ['ip_address_format']
+
+def test_process_data_profile_requests(monkeypatch):
+    import api
+    import profiling
+
+    payload = {"data": [{"ip_address": "192.168.1.1", "marketing_channel": "Category A", "state": "New York"}]}
+
+    monkeypatch.setattr(api.config, 'PROFILE_REQUESTS', False)
+    response = client.post("/process_data/?profile=true", json=payload)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(api.config, 'PROFILE_REQUESTS', True)
+    with profiling._run_lock:
+        response = client.post("/process_data/?profile=true", json=payload)
+    assert response.status_code == 409
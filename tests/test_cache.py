@@ -0,0 +1,69 @@
+import os
+import sys
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+from cache import ResponseCache, TableVersionTracker
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=10)
+    cache.put(('a', (), 1), b'1234')
+    cache.put(('b', (), 1), b'1234')
+    cache.get(('a', (), 1))
+    cache.put(('c', (), 1), b'1234')
+    assert cache.get(('a', (), 1)) == b'1234'
+    assert cache.get(('b', (), 1)) is None
+    assert cache.current_bytes == 8
+
+def test_response_cache_skips_oversized_body():
+    cache = ResponseCache(max_bytes=4)
+    cache.put(('a', (), 1), b'12345')
+    assert len(cache) == 0
+
+def test_etag_changes_with_version_and_params():
+    key = ResponseCache.make_key('/data/', [('b', '2'), ('a', '1')], 3)
+    assert key == ResponseCache.make_key('/data/', [('a', '1'), ('b', '2')], 3)
+    etag = ResponseCache.make_etag(key)
+    assert etag != ResponseCache.make_etag(ResponseCache.make_key('/data/', [('a', '1'), ('b', '2')], 4))
+    assert etag != ResponseCache.make_etag(ResponseCache.make_key('/data/', [], 3))
+
+def test_table_version_tracker_reuses_fresh_version():
+    calls = []
+
+    def fetch_version(table_name):
+        calls.append(table_name)
+        return 7
+
+    tracker = TableVersionTracker(fetch_version, ttl=60)
+    assert tracker.get('processed_data') == 7
+    assert tracker.get('processed_data') == 7
+    assert calls == ['processed_data']
+
+    tracker.set('processed_data', 8)
+    assert tracker.get('processed_data') == 8
+
+    tracker.ttl = 0
+    assert tracker.get('processed_data') == 7
+    assert len(calls) == 2
+
+def test_response_cache_shares_entries_between_workers(tmp_path):
+    from cache import SharedResponseCache
+
+    key = ('/data/', (), 1)
+    first = ResponseCache(shared=SharedResponseCache(str(tmp_path)))
+    second = ResponseCache(shared=SharedResponseCache(str(tmp_path)))
+    first.put(key, b'[]')
+    assert second.get(key) == b'[]'
+    assert len(second) == 1
+
+def test_shared_response_cache_evicts_least_recently_used(tmp_path):
+    import os
+    from cache import SharedResponseCache
+
+    cache = SharedResponseCache(str(tmp_path), max_bytes=10)
+    cache.put(('a', (), 1), b'1234')
+    os.utime(cache._path(('a', (), 1)), (0, 0))
+    cache.put(('b', (), 1), b'1234')
+    cache.put(('c', (), 1), b'1234')
+    assert cache.get(('a', (), 1)) is None
+    assert cache.get(('c', (), 1)) == b'1234'
@@ -0,0 +1,159 @@
+import gc
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import psycopg2.pool
+import pytest
+
+import database
+
+class FakeConnection:
+    closed = 0
+
+    def rollback(self):
+        pass
+
+class FakeThreadedConnectionPool:
+    def __init__(self, minconn, maxconn, db_url):
+        self.connections = []
+
+    def getconn(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def putconn(self, connection, close=False):
+        pass
+
+    def closeall(self):
+        pass
+
+class FakeServer:
+    """
+    Accepts PostgreSQL connections without authentication and records the messages of their clients.
+    """
+
+    def __init__(self):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.messages = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    @staticmethod
+    def receive(client, size):
+        data = b''
+        while len(data) < size:
+            chunk = client.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    @staticmethod
+    def message(kind, payload=b''):
+        return kind + struct.pack('!i', len(payload) + 4) + payload
+
+    def serve(self):
+        while True:
+            client, _ = self.listener.accept()
+            threading.Thread(target=self.session, args=(client,), daemon=True).start()
+
+    def session(self, client):
+        try:
+            while True:
+                length, code = struct.unpack('!ii', self.receive(client, 8))
+                payload = self.receive(client, length - 8)
+                if code not in (80877103, 80877104):  # SSL and GSS encryption requests
+                    break
+                client.sendall(b'N')
+            parameters = {
+                'server_version': '14.0', 'server_encoding': 'UTF8', 'client_encoding': 'UTF8',
+                'DateStyle': 'ISO, MDY', 'integer_datetimes': 'on', 'standard_conforming_strings': 'on',
+            }
+            reply = self.message(b'R', struct.pack('!i', 0))
+            for name, value in parameters.items():
+                reply += self.message(b'S', name.encode() + b'\0' + value.encode() + b'\0')
+            client.sendall(reply + self.message(b'Z', b'I'))
+            while True:
+                kind = self.receive(client, 1)
+                length, = struct.unpack('!i', self.receive(client, 4))
+                self.receive(client, length - 4)
+                self.messages.append(kind)
+                if kind == b'X':
+                    break
+                if kind == b'Q':
+                    client.sendall(self.message(b'C', b'SET\0') + self.message(b'Z', b'I'))
+        except ConnectionError:
+            pass
+        finally:
+            client.close()
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, 'ThreadedConnectionPool', FakeThreadedConnectionPool)
+    return database.ConnectionPool('postgresql://test', maxconn=2, timeout=0.1)
+
+def test_getconn_waits_for_free_connection(pool):
+    first = pool.getconn()
+    pool.getconn()
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
+    pool.putconn(first)
+    assert pool.getconn() is not None
+
+def test_pool_is_recreated_after_fork(pool, monkeypatch):
+    pool.getconn()
+    inherited = pool._pool
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    pool.getconn()
+    pool.getconn()
+    assert pool._pool is not inherited
+    assert pool._inherited == [inherited]
+    assert len(pool._pool.connections) == 2
+
+def test_database_connection_uses_pool(pool, monkeypatch):
+    monkeypatch.setattr(database, 'get_pool', lambda: pool)
+    db = database.DatabaseConnection()
+    db.connect()
+    assert isinstance(db.connection, FakeConnection)
+    db.close()
+    assert db.connection is None
+    assert pool._available.acquire(timeout=0) and pool._available.acquire(timeout=0)
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_fork_does_not_close_inherited_connections():
+    server = FakeServer()
+    pool = database.ConnectionPool(
+        f'postgresql://test@127.0.0.1:{server.port}/test?sslmode=disable&gssencmode=disable', maxconn=2
+    )
+    connection = pool.getconn()
+    pool.putconn(connection)
+    assert pool.getconn() is connection
+    pool.putconn(connection)
+    del connection
+
+    pid = os.fork()
+    if pid == 0:
+        # Replacing the pool of the parent must not deallocate its connections
+        try:
+            pool._current()
+            gc.collect()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    time.sleep(0.2)
+    assert b'X' not in server.messages
+
+    pool.closeall()
+    deadline = time.monotonic() + 5
+    while b'X' not in server.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.messages.count(b'X') == 1
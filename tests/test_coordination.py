@@ -0,0 +1,50 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pytest
+
+from coordination import SharedState, ensure_private_dir
+
+def increment(path):
+    state = SharedState(path)
+    for _ in range(20):
+        state.update(lambda count: (count or 0) + 1)
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    path = str(tmp_path / 'counter.json')
+    assert SharedState(path).read() is None
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(increment, [path] * 4))
+    assert SharedState(path).read() == 80
+
+def test_read_reloads_only_after_another_process_wrote(tmp_path):
+    path = str(tmp_path / 'state.json')
+    loads = []
+
+    def load(f):
+        loads.append(1)
+        return SharedState(path).load(f)
+
+    state = SharedState(path, load=load)
+    state.update(lambda value: {'count': 1})
+    assert state.read() == {'count': 1}
+    assert loads == []
+
+    SharedState(path).update(lambda value: {'count': value['count'] + 1})
+    assert state.read() == {'count': 2}
+    assert state.read() == {'count': 2}
+    assert loads == [1]
+
+def test_ensure_private_dir_rejects_shared_directory(tmp_path):
+    private = str(tmp_path / 'private')
+    assert ensure_private_dir(private) == private
+    assert os.stat(private).st_mode & 0o777 == 0o700
+
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(shared))
@@ -0,0 +1,65 @@
+import gzip
+import json
+import os
+import sys
+from collections import namedtuple
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pytest
+
+from exporters import (
+    compress, encode_arrow, encode_columnar_json, encode_ndjson, negotiate_encoding, negotiate_format,
+)
+
+Column = namedtuple('Column', ['name', 'type_code'])
+
+COLUMNS = [Column('id', 23), Column('state', 1043), Column('purchase', 701)]
+BATCHES = [
+    [(1, 'New York', 100.0), (2, 'California', float('nan'))],
+    [(3, None, None)],
+]
+
+def test_negotiate_format():
+    assert negotiate_format(None) == 'json'
+    assert negotiate_format('application/x-ndjson, */*;q=0.1') == 'ndjson'
+    assert negotiate_format('application/json', 'arrow') == 'arrow'
+    with pytest.raises(ValueError):
+        negotiate_format(None, 'xml')
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) == 'identity'
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('gzip;q=0') == 'identity'
+
+def test_encode_ndjson():
+    body = b''.join(encode_ndjson(COLUMNS, iter(BATCHES)))
+    rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert rows[1] == {'id': 2, 'state': 'California', 'purchase': None}
+    assert len(rows) == 3
+
+def test_encode_columnar_json():
+    body = b''.join(encode_columnar_json(COLUMNS, iter(BATCHES)))
+    assert json.loads(body) == {
+        'id': [1, 2, 3],
+        'state': ['New York', 'California', None],
+        'purchase': [100.0, None, None],
+    }
+
+def test_encode_arrow():
+    pa = pytest.importorskip('pyarrow')
+    body = b''.join(encode_arrow(COLUMNS, iter(BATCHES)))
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.field('id').type == pa.int32()
+    assert table.column('state').to_pylist() == ['New York', 'California', None]
+    assert table.num_rows == 3
+
+def test_compress_gzip():
+    chunks = [b'a' * 1000, b'b' * 1000]
+    assert gzip.decompress(b''.join(compress(iter(chunks), 'gzip'))) == b''.join(chunks)
+
+def test_compress_zstd():
+    zstandard = pytest.importorskip('zstandard')
+    chunks = [b'a' * 1000, b'b' * 1000]
+    body = b''.join(compress(iter(chunks), 'zstd'))
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(body) == b''.join(chunks)
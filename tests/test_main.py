@@ -0,0 +1,61 @@
+import os
+import sys
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pandas as pd
+import pytest
+
+import main
+
+@pytest.fixture
+def processed(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_text('ip_address,purchase\n' + '\n'.join(f'10.0.0.{i},{i}' for i in range(10)))
+    data = pd.DataFrame({
+        'ip_address': [f'10.0.0.{i}' for i in range(10)],
+        'marketing_channel': ['A'] * 10,
+        'purchase': [float(i) for i in range(9)] + [None],
+        'state': ['New York'] * 10,
+        'time_spent_seconds': list(range(10)),
+        'converted': [1] * 9 + [0],
+        'state_abbreviation': ['NY'] * 10,
+        'purchase_normalized': [0.0] * 10,
+        '85th_percentile_state': [0] * 10,
+        '85th_percentile_national': [0] * 10,
+    })
+    return str(file_path), data
+
+def test_to_records_uses_table_columns_and_none():
+    data = pd.DataFrame({column: [None] for column in main.PROCESSED_COLUMNS})
+    data['purchase'] = [float('nan')]
+    data['converted'] = [1]
+    record = main.to_records(data)[0]
+    assert record['purchase'] is None
+    assert record['converted'] == 1
+    assert 'percentile_85_state' in record
+
+def test_quarantine_path_is_per_input_file(monkeypatch):
+    monkeypatch.setattr(main.config, 'QUARANTINE_PATH', None)
+    assert main.quarantine_path('data.csv', 'ab' * 32) == 'data.csv.quarantine.csv'
+    monkeypatch.setattr(main.config, 'QUARANTINE_PATH', '/var/quarantine.csv')
+    assert main.quarantine_path('data.csv', 'ab' * 32) == '/var/quarantine.abababababababab.csv'
+
+def test_load_checkpointed_resumes_after_last_committed_chunk(processed, fake_database):
+    file_path, data = processed
+    rows, checkpoints = [], {}
+
+    db = fake_database(rows=rows, checkpoints=checkpoints, fail_on_chunk=3)
+    with pytest.raises(RuntimeError):
+        main.load_checkpointed(db, data, file_path, chunk_size=3)
+    assert len(rows) == 6
+    assert db.version == 3
+
+    db = fake_database(rows=rows, checkpoints=checkpoints)
+    assert main.load_checkpointed(db, data, file_path, chunk_size=3) == 4
+    assert [row['ip_address'] for row in rows] == list(data['ip_address'])
+    assert checkpoints[main.file_fingerprint(file_path)]['rows_committed'] == 10
+
+    db = fake_database(rows=rows, checkpoints=checkpoints)
+    assert main.load_checkpointed(db, data, file_path, chunk_size=3) == 0
+    assert len(rows) == 10
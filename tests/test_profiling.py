@@ -0,0 +1,84 @@
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pandas as pd
+
+from data_processor import DataProcessor
+import pytest
+
+from profiling import NULL_PROFILER, Profiler, ProfilerBusyError
+
+def busy_step():
+    deadline = time.perf_counter() + 0.1
+    values = []
+    while time.perf_counter() < deadline:
+        values.append(list(range(100)))
+    return len(values)
+
+def test_disabled_profiler_does_nothing():
+    processor = DataProcessor(pd.DataFrame({'purchase': [1.0]}))
+    profiler = Profiler.create(False, 'main', 'unused')
+    assert profiler is NULL_PROFILER
+    assert profiler.instrument(processor) is processor
+    with profiler.run():
+        with profiler.step('step'):
+            pass
+    assert profiler.output_path is None
+    assert not os.path.exists('unused')
+
+def test_sampling_profile_writes_folded_stacks_and_step_memory(tmp_path):
+    profiler = Profiler.create(True, 'main', str(tmp_path), interval=0.001)
+    with profiler.run():
+        processor = profiler.instrument(DataProcessor(pd.DataFrame({'purchase': [1.0, None]})))
+        processor.add_converted_column()
+        with profiler.step('busy'):
+            busy_step()
+
+    with open(profiler.output_path + '.folded') as f:
+        lines = f.read().splitlines()
+    assert any('busy_step (test_profiling.py' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+    with open(profiler.output_path + '.memory.json') as f:
+        report = json.load(f)
+    assert [step['step'] for step in report['steps']] == ['add_converted_column', 'busy']
+    assert report['steps'][1]['peak_bytes'] > 0
+    assert processor.data['converted'].tolist() == [1, 0]
+
+def test_cprofile_mode_writes_pstats(tmp_path):
+    profiler = Profiler.create(True, 'process_data', str(tmp_path), mode='cprofile')
+    with profiler.run():
+        busy_step()
+    stats = pstats.Stats(profiler.output_path + '.prof')
+    assert any(name == 'busy_step' for _, _, name in stats.stats)
+
+def test_one_profiled_run_per_process(tmp_path):
+    first = Profiler.create(True, 'first', str(tmp_path))
+    second = Profiler.create(True, 'second', str(tmp_path))
+    running, done = threading.Event(), threading.Event()
+
+    def profile_first():
+        with first.run():
+            with first.step('wait'):
+                running.set()
+                done.wait(5)
+
+    thread = threading.Thread(target=profile_first)
+    thread.start()
+    running.wait(5)
+    with pytest.raises(ProfilerBusyError):
+        with second.run():
+            pass
+    done.set()
+    thread.join()
+    assert [step['step'] for step in first.steps] == ['wait']
+
+    with second.run():
+        pass
+    assert second.output_path != first.output_path
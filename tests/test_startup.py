@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Upper bound for the cumulative import time of the API module in milliseconds,
+# about twice the 500-570 ms measured on the reference machine, so that a
+# regression of that order fails. Raise it on slower machines.
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1100'))
+
+def import_profile(module: str) -> dict:
+    """
+    Imports a module in a fresh interpreter and returns the cumulative import
+    time in microseconds of every module it pulled in, keyed by module name.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=src_path, capture_output=True, text=True, check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+@pytest.mark.parametrize('heavy_module', ['pandas', 'matplotlib'])
+def test_api_import_skips_heavy_dependencies(heavy_module):
+    assert heavy_module not in import_profile('api')
+
+@pytest.mark.parametrize('module', ['main', 'data_processor'])
+def test_pipeline_import_skips_plotting(module):
+    assert 'matplotlib' not in import_profile(module)
+
+def test_api_import_time_budget():
+    # The fastest of a few imports, as single imports vary with the load of the machine
+    import_ms = min(import_profile('api')['api'] for _ in range(3)) / 1000
+    assert import_ms < IMPORT_TIME_BUDGET_MS
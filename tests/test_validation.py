@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(src_path)
+
+import pandas as pd
+
+from validation import DataValidator
+
+def make_data():
+    return pd.DataFrame({
+        'ip_address': ['192.168.1.1', '256.1.1.1', '10.0.0.1', '10.0.0.2', None],
+        'marketing_channel': ['Category A', 'Category B', 'Category E', 'Category C', 'Category D'],
+        'purchase': [100.0, None, -5.0, 'abc', 20.0],
+        'state': ['New York', 'California', 'Texas', 'Atlantis', 'Ohio'],
+        'time_spent_seconds': [120, 30, 1.5, 200000, None],
+    })
+
+def test_validate_counts_violations_per_rule():
+    validator = DataValidator(make_data())
+    counts = validator.validate()
+    assert counts['ip_address_format'] == 1
+    assert counts['ip_address_missing'] == 1
+    assert counts['marketing_channel_enum'] == 1
+    assert counts['purchase_range'] == 1
+    assert counts['purchase_type'] == 1
+    assert counts['state_enum'] == 1
+    assert counts['time_spent_seconds_type'] == 1
+    assert counts['time_spent_seconds_range'] == 1
+
+def test_validate_splits_valid_and_quarantined_rows():
+    validator = DataValidator(make_data())
+    validator.validate()
+    valid = validator.get_valid()
+    assert valid['ip_address'].tolist() == ['192.168.1.1']
+    assert valid['purchase'].dtype == float
+
+    quarantined = validator.get_quarantined()
+    assert quarantined['reason_codes'].tolist() == [
+        'ip_address_format',
+        'purchase_range;time_spent_seconds_type;marketing_channel_enum',
+        'purchase_type;time_spent_seconds_range;state_enum',
+        'ip_address_missing',
+    ]
+
+def test_quarantine_to_csv_appends(tmp_path):
+    path = str(tmp_path / 'quarantine.csv')
+    for _ in range(2):
+        validator = DataValidator(make_data())
+        validator.validate()
+        validator.quarantine_to_csv(path)
+    quarantined = pd.read_csv(path)
+    assert len(quarantined) == 8
+    assert 'reason_codes' in quarantined.columns
+
+def test_quarantine_to_csv_serializes_appends(tmp_path):
+    path = str(tmp_path / 'quarantine.csv')
+    validators = [DataValidator(make_data()) for _ in range(8)]
+    for validator in validators:
+        validator.validate()
+    threads = [threading.Thread(target=validator.quarantine_to_csv, args=(path,)) for validator in validators]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    quarantined = pd.read_csv(path)
+    assert len(quarantined) == 32
+    assert (quarantined['ip_address'] != 'ip_address').all()
+
+def test_quarantine_to_csv_replaces(tmp_path):
+    path = str(tmp_path / 'quarantine.csv')
+    for _ in range(2):
+        validator = DataValidator(make_data())
+        validator.validate()
+        validator.quarantine_to_csv(path, append=False)
+    assert len(pd.read_csv(path)) == 4